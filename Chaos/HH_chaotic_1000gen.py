@@ -1,179 +1,188 @@
-import scipy as sp
-import pylab as plt
-from scipy.integrate import odeint
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import seaborn
-from matplotlib.animation import FuncAnimation
-import matplotlib.animation as animation
-import moviepy.editor as mp 
-import pynamical
-from pynamical import simulate, bifurcation_plot, save_fig
-import pandas as pd, numpy as np, IPython.display as display, matplotlib.pyplot as plt, matplotlib.cm as cm
-
-
-class HodgkinHuxley():
-    """Full Hodgkin-Huxley Model implemented in Python"""
-
-    C_m  =   1.0
-    """membrane capacitance, in uF/cm^2"""
-
-    g_Na = 120.0
-    """Sodium (Na) maximum conductances, in mS/cm^2"""
-
-    g_K  =  36.0
-    """Postassium (K) maximum conductances, in mS/cm^2"""
-
-    g_L  =   0.3
-    """Leak maximum conductances, in mS/cm^2"""
-
-    E_Na =  20.0
-    """Sodium (Na) Nernst reversal potentials, in mV"""
-
-    E_K  = -10.0
-    """Postassium (K) Nernst reversal potentials, in mV"""
-
-    E_L  = -77.387
-    """Leak Nernst reversal potentials, in mV"""
-
-    t = None
-    """ The time to integrate over """
-
-    def alpha_m(self, V):
-        """Channel gating kinetics. Functions of membrane voltage"""
-        return 0.1*(V+40.0)/(1.0 - sp.exp(-(V+40.0) / 10.0))
-
-    def beta_m(self, V):
-        """Channel gating kinetics. Functions of membrane voltage"""
-        return 4.0*sp.exp(-(V+65.0) / 18.0)
-
-    def alpha_h(self, V):
-        """Channel gating kinetics. Functions of membrane voltage"""
-        return 0.07*sp.exp(-(V+65.0) / 20.0)
-
-    def beta_h(self, V):
-        """Channel gating kinetics. Functions of membrane voltage"""
-        return 1.0/(1.0 + sp.exp(-(V+35.0) / 10.0))
-
-    def alpha_n(self, V):
-        """Channel gating kinetics. Functions of membrane voltage"""
-        return 0.01*(V+55.0)/(1.0 - sp.exp(-(V+55.0) / 10.0))
-
-    def beta_n(self, V):
-        """Channel gating kinetics. Functions of membrane voltage"""
-        return 0.125*sp.exp(-(V+65) / 80.0)
-
-    def I_Na(self, V, m, h):
-        """
-        Membrane current (in uA/cm^2)
-        Sodium (Na = element name)
-
-        |  :param V:
-        |  :param m:
-        |  :param h:
-        |  :return:
-        """
-        return self.g_Na * m**3 * h * (V - self.E_Na)
-
-    def I_K(self, V, n):
-        """
-        Membrane current (in uA/cm^2)
-        Potassium (K = element name)
-
-        |  :param V:
-        |  :param h:
-        |  :return:
-        """
-        return self.g_K  * n**4 * (V - self.E_K)
-    #  Leak
-    def I_L(self, V):
-        """
-        Membrane current (in uA/cm^2)
-        Leak
-
-        |  :param V:
-        |  :param h:
-        |  :return:
-        """
-        return self.g_L * (V - self.E_L)
-
-    def I_inj(self, t):
-        """
-        External Current
-
-        |  :param t: time
-        |  :return: step up to 10 uA/cm^2 at t>100
-        |           step down to 0 uA/cm^2 at t>200
-        |           step up to 35 uA/cm^2 at t>300
-        |           step down to 0 uA/cm^2 at t>400
-        """
-        return 10*(t>100) - 10*(t>200) + 35*(t>300) - 35*(t>400)
-
-    @staticmethod
-    def dALLdt(X, t, self):
-        """
-        Integrate
-
-        |  :param X:
-        |  :param t:
-        |  :return: calculate membrane potential & activation variables
-        """
-        V, m, h, n = X
-
-        dVdt = (self.I_inj(t) - self.I_Na(V, m, h) - self.I_K(V, n) - self.I_L(V)) / self.C_m
-        dmdt = self.alpha_m(V)*(1.0-m) - self.beta_m(V)*m
-        dhdt = self.alpha_h(V)*(1.0-h) - self.beta_h(V)*h
-        dndt = self.alpha_n(V)*(1.0-n) - self.beta_n(V)*n
-        return dVdt, dmdt, dhdt, dndt
-
-    def Main(self):
-        """
-        Main demo for the Hodgkin Huxley neuron model
-        """
-        X = odeint(self.dALLdt, [-50, 0.05, 0.6, 0.32], self.t, args=(self,))
-        V = X[:,0]
-        m = X[:,1]
-        h = X[:,2]
-        n = X[:,3]
-        ina = self.I_Na(V, m, h)
-        ik = self.I_K(V, n)
-        il = self.I_L(V)
-        return V
+import numpy as np
+
+from logistic_map import growth_rates, simulate
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'HH'))
+from HH_base import HodgkinHuxley
+from HH_stimulus import Stimulus
+from HH_cache import SimulationCache
+from HH_checkpoint import Checkpoint
+from HH_instrument import Instrument
+from HH_render import TraceRenderer
+from HH_store import TraceStore
+
+INTERVAL_SCALE = 20.0
+""" ms of inter-stimulus interval per unit of population """
+
+DT = 0.1
+""" Spacing of the integration grid, in ms """
+
+_renderer = None
+""" TraceRenderer reused by every animation of this process """
+
+
+def animate(count, t, main, frames=7, timings=None):
+    """
+    Render the animation of one generation to mp4s/ and gifs/
+
+    |  :param count: generation number
+    |  :param t: integration grid
+    |  :param main: membrane potential at t
+    |  :param frames: number of animation frames, one per stimulus interval
+    |  :param timings: dict to add the render and encode seconds to
+    """
+    global _renderer
+    if _renderer is None:
+        _renderer = TraceRenderer()
+    _renderer.render(t, main, 'Hodgkin-Huxley - Chaotic (gen ' + str(count) + ')',
+                     ['mp4s/HH_chaotic' + str(count) + '.mp4', 'gifs/HH_chaotic' + str(count) + '.gif'],
+                     frames, timings)
+
+
+def run_chunk(gens, pops, render=True, store=None, rows=None, cache=None, instrument=None, X0=None):
+    """
+    Integrate a chunk of generations in one batched solve, and optionally
+    animate each of them. Runs inside a worker process.
+
+    Each generation's populations, in growth rate order, are the intervals
+    of the current pulses driving that generation's neuron.
+
+    |  :param gens: generation numbers
+    |  :param pops: (len(gens), num_rates) populations, used as intervals
+    |  :param render: write the mp4/gif of every generation
+    |  :param store: TraceStore directory to write the (V, m, h, n) traces to
+    |  :param rows: store rows reserved for gens
+    |  :param cache: SimulationCache directory, so reruns skip integration
+    |  :param instrument: JSON lines file to log the chunk's RHS calls, solver
+    |                     statistics and integrate/store/render/encode seconds to
+    |  :param X0: initial state (V, m, h, n) of every generation's neuron
+    |  :return: (len(gens), T) membrane potential on the integration grid
+    """
+    profiler = Instrument(instrument)
+    runner = HodgkinHuxley()
+    if instrument is not None:
+        profiler.attach(runner)
+    runner.stimulus = Stimulus(pops, scale=INTERVAL_SCALE)
+    runner.t = np.arange(0, INTERVAL_SCALE*(pops.shape[1] + 1), DT)
+    X0 = np.tile(runner.X0 if X0 is None else X0, (len(gens), 1))
+    with profiler.run(runner if instrument is not None else None,
+                      generations=[int(g) for g in gens]) as record:
+        with profiler.phase('integrate'):
+            X = runner.integrate(X0) if cache is None else SimulationCache(cache).integrate(runner, X0)
+        V = X[..., 0]
+        if store is not None:
+            with profiler.phase('store'):
+                traces = TraceStore(store, 'r+').traces
+                traces[rows] = X
+                traces.flush()
+        if render:
+            for count, main in zip(gens, V):
+                animate(count, runner.t, main, pops.shape[1], record['phases'])
+    return V
+
+
+def sweep(pops, rates, workers=None, chunksize=25, render=True, store=None, cache=None, instrument=None,
+          checkpoint=None, done=(), X0=None):
+    """
+    Spread the generations over a process pool, chunksize generations per task
+
+    Results are yielded in generation order, together with the growth rate
+    behind each stimulus interval. With a checkpoint, the snapshot is
+    rewritten every time a chunk completes, recording the completed
+    generations next to everything needed to run the rest: the map
+    populations, the initial neuron state and the chunking. A generation's
+    neuron starts from X0 rather than from the previous generation, so no
+    other neuron state is in flight between chunks. The chunk boundaries
+    are kept on resume, so every batched solve, and every result, is the
+    same as in an uninterrupted run.
+
+    |  :param pops: (num_gens, num_rates) logistic map populations
+    |  :param rates: growth rate of each column of pops
+    |  :param workers: number of worker processes, None for one per core
+    |  :param store: directory of a TraceStore to create for the full traces,
+    |                indexed by (generation, None, 'chaotic'), reopened when resuming
+    |  :param cache: SimulationCache directory shared by the workers
+    |  :param instrument: JSON lines file the workers log every chunk's profile to
+    |  :param checkpoint: Checkpoint to keep up to date, None for none
+    |  :param done: generations completed before, skipped
+    |  :param X0: initial state (V, m, h, n) of every neuron, None for HodgkinHuxley.X0
+    |  :return: iterator of (generation, rates, t, V) for the generations run
+    """
+    t = np.arange(0, INTERVAL_SCALE*(pops.shape[1] + 1), DT)
+    X0 = np.asarray(HodgkinHuxley.X0 if X0 is None else X0, dtype=float)
+    gens = np.arange(1, len(pops))
+    chunks = [gens[i:i + chunksize] for i in range(0, len(gens), chunksize)]
+    rows = [None] * len(chunks)
+    if store is not None:
+        keys = [(int(g), None, 'chaotic') for g in gens]
+        if len(done) and os.path.exists(store):
+            traces = TraceStore(store)
+            offsets = np.array([traces.offset(*k) for k in keys])
+        else:
+            offsets = TraceStore.create(store, len(gens), t).reserve(keys)
+        rows = [offsets[c - 1] for c in chunks]
+
+    done = set(int(g) for g in done)
+    todo = [i for i, c in enumerate(chunks) if not done.issuperset(c.tolist())]
+
+    def save():
+        if checkpoint is not None:
+            checkpoint.save(pops=pops, rates=rates, X0=X0, chunksize=chunksize,
+                            done=sorted(done), store=store)
+
+    save()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_chunk, chunks[i], pops[chunks[i]], render, store, rows[i], cache,
+                               instrument, X0): i for i in todo}
+        finished, position = {}, 0
+        for future in as_completed(futures):
+            i = futures[future]
+            finished[i] = future.result()
+            done.update(chunks[i].tolist())
+            save()
+            # hand results out in generation order as soon as they are contiguous
+            while position < len(todo) and todo[position] in finished:
+                i = todo[position]
+                for count, v in zip(chunks[i], finished.pop(i)):
+                    yield count, rates, t, v
+                position += 1
+
 
 if __name__ == '__main__':
-    # run the logistic model for 20 generations for 7 growth rates between 0.5 and 3.5 then view the output
-    pops = simulate(num_gens=1000, rate_min=0.5, rate_max=3.5, num_rates=7)
-    pops = np.array(pops)
-    pops.flatten()
-    pops = np.sort(pops)
-    
-    count = 0
-    for x in range(1, len(pops)):
-        count +=1
-        runner = HodgkinHuxley()
-        runner.t = [val for val in pops[x]]
-        main = runner.Main()
-        fig, ax = plt.subplots()
-        fig.set_tight_layout(True)
-
-        plt.title('Hodgkin-Huxley - Chaotic (gen ' + str(count) + ')')
-        line, = ax.plot(runner.t, main, 'k')
-        plt.ylabel('Membrane Potential (mV)')
-        plt.xlabel('Time (ms)')
-
-        def update(i):
-            label = 'Time (ms), timestep {0}'.format(i)
-            print(label)
-
-            line.set_xdata(np.multiply(runner.t, i))
-            # Update the line and the axes (with a new xlabel). Return a tuple of
-            # "artists" that have to be redrawn for this frame.
-            ax.set_xlabel(label)
-            return runner.t, ax
-        Writer = animation.writers['ffmpeg']
-        writer = Writer(fps=5, metadata=dict(artist='Fernando Espinosa'))
-        anim = FuncAnimation(fig, update, frames=sp.arange(1, len(pops[x])), interval=100)
-        anim.save('mp4s/HH_chaotic' + str(count) + '.mp4', writer=writer)
-        clip = mp.VideoFileClip('mp4s/HH_chaotic' + str(count) + '.mp4')
-        try:
-            clip.write_gif('gifs/HH_chaotic' + str(count) + '.gif')
-        except TypeError:
-            pass
+    parser = argparse.ArgumentParser(description='Chaotic Hodgkin-Huxley generation sweep')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per core)')
+    parser.add_argument('--chunksize', type=int, default=25, help='generations per task')
+    parser.add_argument('--no-render', dest='render', action='store_false', help='skip the mp4/gif output')
+    parser.add_argument('--store', default=None, help='directory to keep the (V, m, h, n) traces in')
+    parser.add_argument('--cache', default=None, help='simulation cache directory, reused across runs')
+    parser.add_argument('--instrument', default=None,
+                        help='JSON lines file to log RHS calls, solver statistics and phase timings to')
+    parser.add_argument('--checkpoint', default='HH_chaotic_1000gen.ckpt',
+                        help='progress snapshot, rewritten as every chunk completes')
+    parser.add_argument('--resume', action='store_true',
+                        help='continue the sweep recorded in --checkpoint instead of starting over')
+    args = parser.parse_args()
+
+    checkpoint = Checkpoint(args.checkpoint)
+    if args.resume and checkpoint.exists():
+        # the snapshot's map populations and chunking, not freshly computed ones
+        state = checkpoint.load()
+        pops, rates, done = state['pops'], state['rates'], state['done']
+        args.chunksize = state['chunksize']
+        args.store, X0 = state['store'], state['X0']
+        print('resuming: {0} of {1} generations done'.format(len(done), len(pops) - 1))
+    else:
+        # run the logistic model for 1000 generations for 7 growth rates between 0.5 and 3.5
+        pops = simulate(num_gens=1000, rate_min=0.5, rate_max=3.5, num_rates=7)
+        rates = growth_rates(rate_min=0.5, rate_max=3.5, num_rates=7)
+        done, X0 = [], None
+
+    results = sweep(pops, rates, args.workers, args.chunksize, args.render, args.store, args.cache,
+                    args.instrument, checkpoint, done, X0)
+    for count, gen_rates, t, V in results:
+        print('gen {0}: rates {1}'.format(count, np.round(gen_rates, 2)))
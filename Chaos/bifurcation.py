@@ -0,0 +1,65 @@
+import os
+import numpy as np
+import matplotlib.pyplot as plt
+
+from logistic_map import logistic_map, growth_rates
+
+
+def bifurcation_density(model=logistic_map, num_gens=1000, rate_min=0, rate_max=4, num_rates=10000,
+                        num_discard=100, initial_pop=0.5, width=None, height=1000,
+                        ymin=0, ymax=1, dtype=np.float32):
+    """
+    Bin the (rate, population) pairs of a bifurcation diagram into a 2-D
+    count image, without keeping the populations themselves
+
+    Generations are streamed in chunks sized so the bin indices of a chunk
+    are about as large as the image, which bounds memory at a few images.
+
+    |  :param width: image columns, None for one column per rate
+    |  :param height: image rows, spanning populations ymin to ymax
+    |  :return: (height, width) counts, row 0 at ymin
+    """
+    width = num_rates if width is None else width
+    rates = growth_rates(rate_min, rate_max, num_rates, dtype)
+    col = np.arange(num_rates) * width // num_rates
+    counts = np.zeros(height * width, dtype=np.int64)
+
+    pop = np.full(num_rates, initial_pop, dtype=dtype)
+    for _ in range(num_discard):
+        pop = model(pop, rates)
+
+    chunk = max(1, height * width // num_rates)
+    rows = np.empty((chunk, num_rates), dtype=np.int64)
+    for start in range(0, num_gens, chunk):
+        n = min(chunk, num_gens - start)
+        for i in range(n):
+            rows[i] = np.floor((pop - ymin) * (height / (ymax - ymin)))
+            pop = model(pop, rates)
+        keep = (rows[:n] >= 0) & (rows[:n] < height)
+        idx = (rows[:n] * width + col)[keep]
+        counts += np.bincount(idx, minlength=height * width)
+    return counts.reshape(height, width)
+
+
+def bifurcation_image(counts, filename='logistic-map-bifurcation-density', xmin=0, xmax=4,
+                      ymin=0, ymax=1, cmap='magma', folder='images'):
+    """
+    Save a count image from bifurcation_density with log-scaled density
+
+    The whole diagram is a single image artist, however many points it holds.
+
+    |  :return: path of the saved png
+    """
+    fig, ax = plt.subplots(figsize=[10, 6])
+    ax.imshow(np.log1p(counts), origin='lower', aspect='auto', cmap=cmap,
+              extent=[xmin, xmax, ymin, ymax], interpolation='nearest')
+    ax.set_title('Logistic Map Bifurcation Diagram')
+    ax.set_xlabel('Growth Rate')
+    ax.set_ylabel('Population')
+
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+    path = os.path.join(folder, filename + '.png')
+    fig.savefig(path, dpi=300, bbox_inches='tight')
+    plt.close(fig)
+    return path
@@ -0,0 +1,121 @@
+import numpy as np
+
+
+def logistic_map(pop, rate):
+    """
+    Logistic map
+
+    |  :param pop: population, between 0 and 1
+    |  :param rate: growth rate
+    |  :return: next generation's population
+    """
+    return pop * rate * (1 - pop)
+
+
+def tent_map(pop, rate):
+    """
+    Tent map, chaotic for growth rates between 1 and 2
+
+    |  :param pop: population, between 0 and 1
+    |  :param rate: growth rate
+    |  :return: next generation's population
+    """
+    return rate * np.minimum(pop, 1 - pop)
+
+
+def growth_rates(rate_min=0.5, rate_max=4, num_rates=8, dtype=np.float64):
+    """
+    Evenly spaced growth rates, the columns of simulate()
+    """
+    return np.linspace(rate_min, rate_max, num_rates, dtype=dtype)
+
+
+def simulate(model=logistic_map, num_gens=50, rate_min=0.5, rate_max=4, num_rates=8,
+             num_discard=0, initial_pop=0.5, dtype=np.float64, out=None):
+    """
+    Iterate a map for every growth rate at once
+
+    Same arguments and layout as pynamical.simulate, but the result is a
+    plain array: row g is generation g, column j is growth rate j of
+    growth_rates(rate_min, rate_max, num_rates).
+
+    |  :param model: map taking (pop, rate) arrays
+    |  :param num_gens: generations to keep
+    |  :param num_discard: generations to iterate and throw away first
+    |  :param initial_pop: population every rate starts from
+    |  :param dtype: float64, or float32 to halve the memory of large sweeps
+    |  :param out: preallocated (num_gens, num_rates) array to fill, sets dtype
+    |  :return: (num_gens, num_rates) populations
+    """
+    if out is None:
+        out = np.empty((num_gens, num_rates), dtype=dtype)
+    elif out.shape != (num_gens, num_rates):
+        raise ValueError('out has shape {0}, expected {1}'.format(out.shape, (num_gens, num_rates)))
+    rates = growth_rates(rate_min, rate_max, num_rates, out.dtype)
+    pop = np.full(num_rates, initial_pop, dtype=out.dtype)
+    for _ in range(num_discard):
+        pop = model(pop, rates)
+    for gen in range(num_gens):
+        out[gen] = pop
+        pop = model(pop, rates)
+    return out
+
+
+def lyapunov(rates, num_gens=1000, num_discard=100, initial_pop=0.4, dtype=np.float64):
+    """
+    Lyapunov exponent of the logistic map at every growth rate at once
+
+    Averages log|r(1 - 2x)| along each orbit, summed generation by
+    generation, so memory is a few arrays of len(rates) however long the
+    orbit. Positive exponents mark chaotic rates.
+
+    |  :param rates: growth rates
+    |  :param num_gens: generations to average over
+    |  :param num_discard: transient generations to skip first
+    |  :param initial_pop: population every orbit starts from. Avoid the
+    |                      critical point 0.5: at r = 4 it maps to 1 and then
+    |                      the unstable fixed point 0, giving ln 4 instead of ln 2
+    |  :return: exponent per rate, -inf where the orbit hits x = 0.5 exactly
+    """
+    rates = np.asarray(rates, dtype=dtype)
+    pop = np.full(rates.shape, initial_pop, dtype=dtype)
+    for _ in range(num_discard):
+        pop = logistic_map(pop, rates)
+
+    total = np.zeros(rates.shape)
+    with np.errstate(divide='ignore'):
+        for _ in range(num_gens):
+            total += np.log(np.abs(rates * (1 - 2*pop)))
+            pop = logistic_map(pop, rates)
+    return total / num_gens
+
+
+def chaotic_intervals(rate=3.9, chunk_size=1000, initial_pop=0.4, num_discard=100,
+                      model=logistic_map, num_chunks=None, dtype=np.float64):
+    """
+    Lazily yield a map's orbit in fixed-size chunks, for use as chaotic
+    inter-stimulus intervals
+
+    Only the current population is kept between chunks, so an orbit of any
+    length streams at constant memory.
+
+    |  :param rate: growth rate, or an array of rates for one orbit each
+    |  :param chunk_size: generations per chunk
+    |  :param initial_pop: population every orbit starts from, away from the
+    |                      critical point 0.5 for the reason given in lyapunov()
+    |  :param model: map taking (pop, rate), e.g. logistic_map or tent_map
+    |  :param num_chunks: chunks to yield, None for an endless stream
+    |  :return: iterator of (chunk_size,) arrays, or (chunk_size, len(rate))
+    """
+    rate = np.asarray(rate, dtype=dtype)
+    pop = np.full(rate.shape, initial_pop, dtype=dtype)
+    for _ in range(num_discard):
+        pop = model(pop, rate)
+    count = 0
+    while num_chunks is None or count < num_chunks:
+        chunk = np.empty((chunk_size,) + rate.shape, dtype=dtype)
+        for i in range(chunk_size):
+            pop = model(pop, rate)
+            chunk[i] = pop
+        count += 1
+        yield chunk
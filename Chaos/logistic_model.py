@@ -14,8 +14,17 @@
 # In[1]:
 
 import pynamical
-from pynamical import simulate, bifurcation_plot, save_fig
+from pynamical import bifurcation_plot, save_fig
 import pandas as pd, numpy as np, IPython.display as display, matplotlib.pyplot as plt, matplotlib.cm as cm
+from logistic_map import growth_rates
+import logistic_map
+
+
+def simulate(rate_min=0.5, rate_max=4, num_rates=8, **kwargs):
+    '''logistic_map.simulate, wrapped in the DataFrame pynamical's plots expect:
+       one column per growth rate, one row per generation'''
+    pops = logistic_map.simulate(rate_min=rate_min, rate_max=rate_max, num_rates=num_rates, **kwargs)
+    return pd.DataFrame(pops, columns=growth_rates(rate_min, rate_max, num_rates))
 
 
 # In[2]:
@@ -106,6 +115,16 @@ pops = simulate(num_gens=200, rate_min=3.84, rate_max=3.856, num_rates=1000, num
 bifurcation_plot(pops, xmin=3.84, xmax=3.856, ymin=0.445, ymax=0.552, filename='logistic-map-bifurcation-4')
 
 
+# ## At publication density, bin the points into an image instead of plotting each one
+
+# In[10b]:
+
+# 10,000 growth rates x 1,000 generations is 10 million points, binned straight into a 1000-row density image
+from bifurcation import bifurcation_density, bifurcation_image
+counts = bifurcation_density(num_gens=1000, rate_min=0, rate_max=4, num_rates=10000, num_discard=100, height=1000)
+bifurcation_image(counts, xmin=0, xmax=4, filename='logistic-map-bifurcation-density')
+
+
 # ## Now let's visualize the system's sensitive dependence on initial conditions
 
 # In[11]:
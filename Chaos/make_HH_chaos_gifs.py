@@ -1,6 +1,63 @@
-import moviepy.editor as mp 
-import os 
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-for vid in os.listdir('mp4s'):
-	clip = mp.VideoFileClip('mp4s/' + vid)
-	clip.write_gif('gifs/' + vid.strip('.mp4') + '.gif')
\ No newline at end of file
+import moviepy.editor as mp
+
+
+def gif_path(vid, dst='gifs'):
+    """gifs/<name>.gif for mp4s/<name>.mp4"""
+    return os.path.join(dst, os.path.splitext(os.path.basename(vid))[0] + '.gif')
+
+
+def is_stale(src, dst):
+    """True when dst is missing or older than src"""
+    return not os.path.exists(dst) or os.path.getmtime(dst) < os.path.getmtime(src)
+
+
+def convert(src, dst):
+    """
+    Convert one clip, writing through a temporary file so an interrupted
+    run never leaves a GIF that looks up to date
+
+    |  :return: dst and the seconds it took
+    """
+    start = time.time()
+    tmp = dst + '.part.gif'
+    clip = mp.VideoFileClip(src)
+    try:
+        clip.write_gif(tmp)
+    finally:
+        clip.close()
+    os.replace(tmp, dst)
+    return dst, time.time() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert stale mp4s/ clips to gifs/ in parallel')
+    parser.add_argument('--src', default='mp4s', help='directory of mp4 clips')
+    parser.add_argument('--dst', default='gifs', help='directory of gif outputs')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per core)')
+    parser.add_argument('--force', action='store_true', help='convert every clip, even up to date ones')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.dst):
+        os.makedirs(args.dst)
+    jobs = []
+    for vid in sorted(os.listdir(args.src)):
+        if not vid.lower().endswith('.mp4'):
+            continue
+        src = os.path.join(args.src, vid)
+        dst = gif_path(vid, args.dst)
+        if args.force or is_stale(src, dst):
+            jobs.append((src, dst))
+    print('{0} stale clip(s) to convert'.format(len(jobs)))
+
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(convert, src, dst) for src, dst in jobs]
+        for future in as_completed(futures):
+            dst, seconds = future.result()
+            print('{0}: {1:.2f} s'.format(dst, seconds))
+    print('converted {0} clip(s) in {1:.2f} s'.format(len(jobs), time.time() - start))
@@ -1,10 +1,53 @@
-import scipy as sp
-import pylab as plt
-from scipy.integrate import odeint
-import seaborn
-from matplotlib.animation import FuncAnimation
-import matplotlib.animation as animation
-import moviepy.editor as mp 
+import numpy as np
+from scipy import integrate, sparse
+from scipy.integrate import odeint, solve_ivp
+
+from HH_stimulus import Stimulus
+
+
+def _vtrap(x, y):
+    """x / (1 - exp(-x/y)), taking its limit y at the removable 0/0 at x = 0"""
+    x = np.asarray(x, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(np.abs(x) < 1e-6*y, y + x/2.0, x / -np.expm1(-x / y))
+
+
+def _dvtrap(x, y):
+    """Derivative of _vtrap with respect to x, taking its limit 1/2 at x = 0"""
+    x = np.asarray(x, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        e = np.exp(-x / y)
+        d = (1.0 - e - x*e/y) / (1.0 - e)**2
+        return np.where(np.abs(x) < 1e-3*y, 0.5 + x/(6.0*y), d)
+
+
+def _banded(J):
+    """Pack (N, 4, 4) Jacobian blocks into the (7, 4N) band storage of LSODA"""
+    packed = np.zeros((7, J.size // 4))
+    for i in range(4):
+        for j in range(4):
+            packed[3 + i - j, j::4] = J[:, i, j]
+    return packed
+
+
+def _merge_info(infos):
+    """Join the solver_info of consecutive solves into the info of one"""
+    merged = dict(infos[-1])
+    for k, v in infos[-1].items():
+        if isinstance(v, np.ndarray):
+            parts, total = [], 0
+            for info in infos:
+                a = info[k]
+                if k in ('nst', 'nfe', 'nje'):
+                    # running totals, continued from the previous solve
+                    a = a + total
+                    total = a[-1]
+                parts.append(a)
+            merged[k] = np.concatenate(parts)
+        elif k in ('nfev', 'njev', 'nlu'):
+            merged[k] = sum(info[k] for info in infos)
+    return merged
+
 
 class HodgkinHuxley():
     """Full Hodgkin-Huxley Model implemented in Python"""
@@ -30,32 +73,148 @@ class HodgkinHuxley():
     E_L  = -77.387
     """Leak Nernst reversal potentials, in mV"""
 
+    CLASSIC = dict(E_Na=50.0, E_K=-77.0, E_L=-54.387)
+    """ The classic squid axon reversal potentials, which the rate functions
+    are written for. With the defaults above the neuron settles near -10 mV
+    and fires only its start-up spike; set these on an instance, or sweep
+    them with HH_sweep, for repetitive firing """
+
     t = None
-    """ The time to integrate over """
+    """ The time to integrate over. A 1-D grid shared by every neuron, or an
+    (N, T) array giving each neuron of a batched run its own sample times """
+
+    X0 = [-50, 0.05, 0.6, 0.32]
+    """ Initial state (V, m, h, n) """
+
+    stimulus = None
+    """ Stimulus or Current driving I_inj, None for the built-in current steps """
+
+    step_times = (100.0, 200.0, 300.0, 400.0)
+    """ Edges of the built-in current steps of I_inj, in ms """
+
+    step_currents = (10.0, 0.0, 35.0, 0.0)
+    """ Built-in current from each edge of step_times on, in uA/cm^2 """
+
+    tabulated = False
+    """ Look the gating rates up in precomputed tables instead of evaluating them """
+
+    V_table = (-150.0, 100.0, 0.05)
+    """ Voltage grid (min, max, step) of the rate tables, in mV """
+
+    _tables = {}
+    """ Rate tables shared by every instance, keyed by class and voltage grid """
+
+    method = 'odeint'
+    """ Integrator: 'odeint', a solve_ivp method such as 'BDF', 'Radau' or
+    'LSODA', or 'rush_larsen' for fixed-step exponential Euler """
+
+    dt = 0.01
+    """ Largest step of the 'rush_larsen' method, in ms """
+
+    use_jacobian = True
+    """ Hand the analytic Jacobian to the integrator instead of finite differences """
+
+    rtol = None
+    """ Relative tolerance of the integrator, None for its default """
+
+    atol = None
+    """ Absolute tolerance of the integrator, None for its default """
+
+    full_output = False
+    """ Keep the integrator's statistics of the latest solve in solver_info """
+
+    solver_info = None
+    """ odeint's full_output dict, solve_ivp's nfev/njev/nlu or the
+    rush_larsen step count of the latest solve, when full_output is set """
+
+    dtype = np.float64
+    """ dtype of the returned trajectories. Integration always runs in
+    float64; float32 halves the memory and I/O of the stored traces """
+
+    FIELDS = ('V', 'm', 'h', 'n')
+    """ State variables, in the order of the last axis of integrate() """
+
+    CURRENTS = ('I_Na', 'I_K', 'I_L')
+    """ Membrane currents outputs() can derive from the states """
 
     def alpha_m(self, V):
         """Channel gating kinetics. Functions of membrane voltage"""
-        return 0.1*(V+40.0)/(1.0 - sp.exp(-(V+40.0) / 10.0))
+        return 0.1*_vtrap(V+40.0, 10.0)
 
     def beta_m(self, V):
         """Channel gating kinetics. Functions of membrane voltage"""
-        return 4.0*sp.exp(-(V+65.0) / 18.0)
+        return 4.0*np.exp(-(V+65.0) / 18.0)
 
     def alpha_h(self, V):
         """Channel gating kinetics. Functions of membrane voltage"""
-        return 0.07*sp.exp(-(V+65.0) / 20.0)
+        return 0.07*np.exp(-(V+65.0) / 20.0)
 
     def beta_h(self, V):
         """Channel gating kinetics. Functions of membrane voltage"""
-        return 1.0/(1.0 + sp.exp(-(V+35.0) / 10.0))
+        return 1.0/(1.0 + np.exp(-(V+35.0) / 10.0))
 
     def alpha_n(self, V):
         """Channel gating kinetics. Functions of membrane voltage"""
-        return 0.01*(V+55.0)/(1.0 - sp.exp(-(V+55.0) / 10.0))
+        return 0.01*_vtrap(V+55.0, 10.0)
 
     def beta_n(self, V):
         """Channel gating kinetics. Functions of membrane voltage"""
-        return 0.125*sp.exp(-(V+65) / 80.0)
+        return 0.125*np.exp(-(V+65) / 80.0)
+
+    def rate_table(self):
+        """
+        Tabulate all six gating rates over the V_table grid
+
+        The table is built once per class and grid, so it only has to be
+        rebuilt when the kinetics or V_table change.
+
+        |  :return: (6, K) array of alpha_m, beta_m, alpha_h, beta_h, alpha_n, beta_n
+        """
+        key = (type(self), tuple(self.V_table))
+        if key not in self._tables:
+            V_min, V_max, dV = self.V_table
+            V = np.linspace(V_min, V_max, int(round((V_max - V_min) / dV)) + 1)
+            self._tables[key] = np.array([self.alpha_m(V), self.beta_m(V),
+                                          self.alpha_h(V), self.beta_h(V),
+                                          self.alpha_n(V), self.beta_n(V)])
+        return self._tables[key]
+
+    def gating_rates(self, V):
+        """
+        All six channel gating rates at once. Reads the rate table with
+        linear interpolation when tabulated is set, clamping V to the grid.
+
+        |  :param V:
+        |  :return: alpha_m, beta_m, alpha_h, beta_h, alpha_n, beta_n
+        """
+        if not self.tabulated:
+            return (self.alpha_m(V), self.beta_m(V), self.alpha_h(V),
+                    self.beta_h(V), self.alpha_n(V), self.beta_n(V))
+        table = self.rate_table()
+        V_min, V_max, dV = self.V_table
+        x = (np.clip(V, V_min, V_max) - V_min) / dV
+        i = np.minimum(x.astype(int), table.shape[1] - 2)
+        f = x - i
+        return table[:, i]*(1.0 - f) + table[:, i + 1]*f
+
+    def gating_rate_derivatives(self, V):
+        """
+        Derivatives of the six gating rates with respect to V. In tabulated
+        mode these are the slopes of the interpolating segments.
+
+        |  :param V:
+        |  :return: d/dV of alpha_m, beta_m, alpha_h, beta_h, alpha_n, beta_n
+        """
+        if self.tabulated:
+            table = self.rate_table()
+            V_min, V_max, dV = self.V_table
+            x = (np.clip(V, V_min, V_max) - V_min) / dV
+            i = np.minimum(x.astype(int), table.shape[1] - 2)
+            return (table[:, i + 1] - table[:, i]) / dV
+        b_h = self.beta_h(V)
+        return (0.1*_dvtrap(V+40.0, 10.0), -self.beta_m(V) / 18.0,
+                -self.alpha_h(V) / 20.0, b_h*(1.0 - b_h) / 10.0,
+                0.01*_dvtrap(V+55.0, 10.0), -self.beta_n(V) / 80.0)
 
     def I_Na(self, V, m, h):
         """
@@ -96,70 +255,508 @@ class HodgkinHuxley():
         External Current
 
         |  :param t: time
-        |  :return: step up to 10 uA/cm^2 at t>100
+        |  :return: self.stimulus(t) when a stimulus is set, otherwise the
+        |           built-in steps, step_currents[i] at t>step_times[i]; by default
+        |           step up to 10 uA/cm^2 at t>100
         |           step down to 0 uA/cm^2 at t>200
         |           step up to 35 uA/cm^2 at t>300
         |           step down to 0 uA/cm^2 at t>400
         """
-        return 10*(t>100) - 10*(t>200) + 35*(t>300) - 35*(t>400)
+        if self.stimulus is not None:
+            return self.stimulus(t)
+        I, before = 0.0, 0.0
+        for edge, current in zip(self.step_times, self.step_currents):
+            I = I + (current - before)*(t>edge)
+            before = current
+        return I
 
     @staticmethod
     def dALLdt(X, t, self):
         """
         Integrate
 
-        |  :param X:
+        |  :param X: state (V, m, h, n), or N states flattened neuron by neuron
         |  :param t:
         |  :return: calculate membrane potential & activation variables
         """
-        V, m, h, n = X
+        V, m, h, n = np.reshape(X, (-1, 4)).T
+
+        a_m, b_m, a_h, b_h, a_n, b_n = self.gating_rates(V)
 
         dVdt = (self.I_inj(t) - self.I_Na(V, m, h) - self.I_K(V, n) - self.I_L(V)) / self.C_m
-        dmdt = self.alpha_m(V)*(1.0-m) - self.beta_m(V)*m
-        dhdt = self.alpha_h(V)*(1.0-h) - self.beta_h(V)*h
-        dndt = self.alpha_n(V)*(1.0-n) - self.beta_n(V)*n
-        return dVdt, dmdt, dhdt, dndt
+        dmdt = a_m*(1.0-m) - b_m*m
+        dhdt = a_h*(1.0-h) - b_h*h
+        dndt = a_n*(1.0-n) - b_n*n
+        return np.column_stack((dVdt, dmdt, dhdt, dndt)).ravel()
+
+    @staticmethod
+    def jacobian(X, t, self):
+        """
+        Analytic Jacobian of dALLdt
+
+        |  :param X: state (V, m, h, n), or N states flattened neuron by neuron
+        |  :param t:
+        |  :return: (N, 4, 4) blocks, d(dXi/dt)/dXj of each neuron
+        """
+        V, m, h, n = np.reshape(X, (-1, 4)).T
+        a_m, b_m, a_h, b_h, a_n, b_n = self.gating_rates(V)
+        da_m, db_m, da_h, db_h, da_n, db_n = self.gating_rate_derivatives(V)
+
+        J = np.zeros((len(V), 4, 4))
+        J[:, 0, 0] = -(self.g_Na * m**3 * h + self.g_K * n**4 + self.g_L) / self.C_m
+        J[:, 0, 1] = -3.0 * self.g_Na * m**2 * h * (V - self.E_Na) / self.C_m
+        J[:, 0, 2] = -self.g_Na * m**3 * (V - self.E_Na) / self.C_m
+        J[:, 0, 3] = -4.0 * self.g_K * n**3 * (V - self.E_K) / self.C_m
+        J[:, 1, 0] = da_m*(1.0-m) - db_m*m
+        J[:, 1, 1] = -(a_m + b_m)
+        J[:, 2, 0] = da_h*(1.0-h) - db_h*h
+        J[:, 2, 2] = -(a_h + b_h)
+        J[:, 3, 0] = da_n*(1.0-n) - db_n*n
+        J[:, 3, 3] = -(a_n + b_n)
+        return J
+
+    def step(self, X, t, dt, I_syn=0.0):
+        """
+        Advance states by one exponential-Euler (Rush-Larsen) step
+
+        Each gate is linear in itself at fixed V, so m, h and n take the
+        exact update x_inf + (x - x_inf)*exp(-dt/tau_x). V then takes a
+        backward-Euler step with the conductances of the updated gates,
+        which is linear in V and needs no iteration.
+
+        |  :param X: (N, 4) states at time t
+        |  :param t:
+        |  :param dt: step, in ms
+        |  :param I_syn: current added to I_inj over the step, e.g. synaptic
+        |                input, in uA/cm^2, scalar or (N,)
+        |  :return: (N, 4) states at time t + dt
+        """
+        V, m, h, n = X.T
+        a_m, b_m, a_h, b_h, a_n, b_n = self.gating_rates(V)
+
+        k_m, k_h, k_n = a_m + b_m, a_h + b_h, a_n + b_n
+        m = a_m/k_m + (m - a_m/k_m)*np.exp(-dt*k_m)
+        h = a_h/k_h + (h - a_h/k_h)*np.exp(-dt*k_h)
+        n = a_n/k_n + (n - a_n/k_n)*np.exp(-dt*k_n)
+
+        G_Na = self.g_Na * m**3 * h
+        G_K = self.g_K * n**4
+        V = ((self.C_m/dt)*V + self.I_inj(t + dt) + I_syn + G_Na*self.E_Na + G_K*self.E_K + self.g_L*self.E_L) \
+            / (self.C_m/dt + G_Na + G_K + self.g_L)
+        return np.column_stack((V, m, h, n))
+
+    def _rush_larsen(self, y0, grid):
+        """
+        Step over grid with self.step, splitting every interval into equal
+        steps no longer than self.dt
+
+        |  :return: (len(grid), len(y0)) states
+        """
+        out = np.empty((len(grid), len(y0)))
+        out[0] = y0
+        X = np.reshape(y0, (-1, 4))
+        steps = np.maximum(np.ceil(np.diff(grid) / self.dt - 1e-9), 1).astype(int)
+        for k, n_steps in enumerate(steps):
+            t, dt = grid[k], (grid[k + 1] - grid[k]) / n_steps
+            for i in range(n_steps):
+                X = self.step(X, t + i*dt, dt)
+            out[k + 1] = X.ravel()
+        if self.full_output:
+            self.solver_info = dict(nst=int(steps.sum()))
+        return out
 
-    def Main(self):
+    def _solve(self, y0, grid):
+        """
+        Run the selected integrator over grid from the flattened state y0
+
+        The built-in current steps are discontinuous, and an adaptive
+        integrator either steps straight over them or fails its error test
+        at them, so without a stimulus it is restarted at every step edge.
+
+        |  :return: (len(grid), len(y0)) states
+        """
+        if self.method == 'rush_larsen':
+            return self._rush_larsen(y0, grid)
+        edges = self._step_edges(grid[0], grid[-1])
+        if not edges:
+            return self._solve_smooth(y0, grid)
+
+        out = np.empty((len(grid), len(y0)))
+        out[0] = y0
+        infos = []
+        bounds = [grid[0]] + edges + [grid[-1]]
+        for a, b in zip(bounds[:-1], bounds[1:]):
+            take = (grid > a) & (grid <= b)
+            piece = np.unique(np.concatenate(([a], grid[take], [b])))
+            X = self._solve_smooth(y0, piece)
+            out[take] = X[np.searchsorted(piece, grid[take])]
+            y0 = X[-1]
+            infos.append(self.solver_info)
+        if self.full_output:
+            self.solver_info = _merge_info(infos)
+        return out
+
+    def _step_edges(self, t0, t1):
+        """
+        Edges of the built-in current steps strictly between t0 and t1,
+        none when a stimulus replaces them
+        """
+        if self.stimulus is not None:
+            return []
+        return [e for e in self.step_times if t0 < e < t1]
+
+    def _solve_smooth(self, y0, grid):
+        """
+        _solve over a grid the injected current has no step edges inside
+
+        |  :return: (len(grid), len(y0)) states
+        """
+        banded = len(y0) > 4
+        tol = {k: v for k, v in (('rtol', self.rtol), ('atol', self.atol)) if v is not None}
+        if self.method == 'odeint':
+            Dfun = None
+            if self.use_jacobian:
+                if banded:
+                    Dfun = lambda y, t, self: _banded(self.jacobian(y, t, self))
+                else:
+                    Dfun = lambda y, t, self: self.jacobian(y, t, self)[0]
+            bands = dict(ml=3, mu=3) if banded else {}
+            if self.stimulus is not None and np.isfinite(self.stimulus.width):
+                # never step over a whole pulse, and allow for the restarts
+                # at the pulse edges of every neuron in the batch
+                tol.update(hmax=self.stimulus.width, mxstep=5000)
+            if self.full_output:
+                X, self.solver_info = odeint(self.dALLdt, y0, grid, args=(self,), Dfun=Dfun,
+                                             full_output=True, **bands, **tol)
+                return X
+            return odeint(self.dALLdt, y0, grid, args=(self,), Dfun=Dfun, **bands, **tol)
+
+        sol = solve_ivp(lambda t, y: self.dALLdt(y, t, self), (grid[0], grid[-1]), y0,
+                        method=self.method, t_eval=grid, **self._ivp_options(y0, self.method))
+        if not sol.success:
+            raise RuntimeError(sol.message)
+        if self.full_output:
+            self.solver_info = dict(nfev=sol.nfev, njev=sol.njev, nlu=sol.nlu)
+        return sol.y.T
+
+    def _ivp_options(self, y0, method):
+        """
+        Tolerance and Jacobian arguments of a solve_ivp method for state y0
+        """
+        banded = len(y0) > 4
+        opts = {k: v for k, v in (('rtol', self.rtol), ('atol', self.atol)) if v is not None}
+        if self.stimulus is not None and np.isfinite(self.stimulus.width):
+            opts['max_step'] = self.stimulus.width
+        if method == 'LSODA':
+            if banded:
+                opts.update(lband=3, uband=3)
+            if self.use_jacobian:
+                opts['jac'] = ((lambda t, y: _banded(self.jacobian(y, t, self))) if banded
+                               else (lambda t, y: self.jacobian(y, t, self)[0]))
+        elif self.use_jacobian:
+            if banded:
+                # block diagonal, one 4x4 block per neuron
+                blocks = lambda J: sparse.bsr_matrix((J, np.arange(len(J)), np.arange(len(J) + 1)))
+                opts['jac'] = lambda t, y: blocks(self.jacobian(y, t, self))
+            else:
+                opts['jac'] = lambda t, y: self.jacobian(y, t, self)[0]
+        elif banded:
+            N = len(y0) // 4
+            opts['jac_sparsity'] = sparse.bsr_matrix(
+                (np.ones((N, 4, 4)), np.arange(N), np.arange(N + 1)))
+        return opts
+
+    def integrate(self, X0=None):
+        """
+        Solve the model over self.t
+
+        A 1-D X0 with a 1-D self.t is the single neuron case. An (N, 4) X0,
+        or a 2-D self.t, integrates N neurons in one solver call. The state
+        is interleaved neuron by neuron so the Jacobian is block diagonal
+        with bandwidth 3, which keeps the solver cost linear in N.
+        Every neuron of a batched run starts from its X0 at the earliest
+        time in self.t.
+
+        |  :param X0: initial state (V, m, h, n), or (N, 4) initial states
+        |  :return: (T, 4) states, or (N, T, 4) when batched, in self.dtype
+        """
+        return self._integrate(X0).astype(self.dtype, copy=False)
+
+    def _integrate(self, X0=None):
+        """integrate() before the cast to self.dtype"""
+        X0 = np.asarray(self.X0 if X0 is None else X0, dtype=float)
+        t = np.asarray(self.t, dtype=float)
+        if X0.ndim == 1 and t.ndim == 1:
+            return self._solve(X0, t)
+
+        N = len(t) if t.ndim == 2 else len(np.atleast_2d(X0))
+        X0 = np.broadcast_to(X0, (N, 4))
+        if t.ndim == 2:
+            # integrate once over the union of the per-neuron sample times,
+            # merging times under 1e-12 ms apart that odeint cannot resolve
+            grid, idx = np.unique(np.round(t, 12), return_inverse=True)
+            idx = idx.reshape(t.shape)
+        else:
+            grid, idx = t, None
+        X = self._solve(X0.ravel(), grid)
+        X = X.reshape(len(grid), N, 4).transpose(1, 0, 2)
+        if idx is not None:
+            X = X[np.arange(N)[:, None], idx]
+        return X
+
+    def Main(self, X0=None):
         """
         Main demo for the Hodgkin Huxley neuron model
+
+        |  :param X0: initial state, or (N, 4) initial states for a batched run
+        |  :return: membrane potential, (T,) or (N, T) when batched
+        """
+        return self.integrate(X0)[..., 0]
+
+    def outputs(self, X0=None, fields=('V',)):
+        """
+        Solve the model and keep only the requested outputs. Currents are
+        computed, from the float64 states, only when asked for.
+
+        |  :param X0: initial state, or (N, 4) initial states for a batched run
+        |  :param fields: names from FIELDS and CURRENTS, or 'gates' for m, h
+        |                 and n, or 'currents' for I_Na, I_K and I_L
+        |  :return: dict of name to (T,) arrays, (N, T) when batched, in self.dtype
+        """
+        names = []
+        for f in fields:
+            for name in {'gates': self.FIELDS[1:], 'currents': self.CURRENTS}.get(f, (f,)):
+                if name not in self.FIELDS + self.CURRENTS:
+                    raise ValueError('unknown output {0!r}'.format(name))
+                if name not in names:
+                    names.append(name)
+        X = self._integrate(X0)
+        V, m, h, n = (X[..., i] for i in range(4))
+        out = {}
+        for name in names:
+            if name in self.FIELDS:
+                out[name] = X[..., self.FIELDS.index(name)]
+            elif name == 'I_Na':
+                out[name] = self.I_Na(V, m, h)
+            elif name == 'I_K':
+                out[name] = self.I_K(V, n)
+            else:
+                out[name] = self.I_L(V)
+        return {name: a.astype(self.dtype) for name, a in out.items()}
+
+    def windows(self, duration, window, X0=None, dt=0.1, reduce=None):
         """
+        Integrate from 0 to duration one window at a time, carrying
+        (V, m, h, n) across the window boundaries
 
-        X = odeint(self.dALLdt, [-50, 0.05, 0.6, 0.32], self.t, args=(self,))
-        V = X[:,0]
-        m = X[:,1]
-        h = X[:,2]
-        n = X[:,3]
-        ina = self.I_Na(V, m, h)
-        ik = self.I_K(V, n)
-        il = self.I_L(V)
-        return V
+        Only the current window's states are held, so memory depends on the
+        window length, not on the duration. The stimulus keeps its absolute
+        times, so the windows join into the run over the whole grid.
+
+        |  :param duration: simulated time, in ms
+        |  :param window: window length, in ms, rounded to a whole number of dt
+        |  :param X0: initial state, or (N, 4) initial states for a batched run
+        |  :param dt: spacing of the output grid, in ms
+        |  :param reduce: function of (t, X) applied to every window, e.g. to
+        |                 keep a firing rate or a downsampled V instead of X
+        |  :return: iterator of (t, X) per window, X (T, 4) or (N, T, 4) when
+        |           batched and in self.dtype, or of reduce(t, X)
+        """
+        t_saved = self.t
+        X = np.asarray(self.X0 if X0 is None else X0, dtype=float)
+        n_total = int(round(duration / dt))
+        per = max(int(round(window / dt)), 1)
+        try:
+            for start in range(0, n_total, per):
+                self.t = dt*np.arange(start, min(start + per, n_total) + 1)
+                # carry the float64 state, whatever the output dtype
+                states = self._integrate(X)
+                X = states[..., -1, :]
+                # the window's first sample is the previous window's last
+                first = 0 if start == 0 else 1
+                t, states = self.t[first:], states[..., first:, :].astype(self.dtype, copy=False)
+                yield (t, states) if reduce is None else reduce(t, states)
+        finally:
+            self.t = t_saved
+
+    def stream(self, intervals, X0=None, dt=0.1, scale=1.0, amplitude=10.0, width=1.0, tail=10.0,
+               max_pending=100000):
+        """
+        Integrate while the stimulus intervals are still being generated
+
+        Each chunk of intervals becomes the next stretch of pulse train, and
+        the model is integrated up to the last onset every neuron knows of,
+        carrying (V, m, h, n) and any pulse still in progress into the next
+        window. Once the intervals run out, a last window runs past the end
+        of every neuron's final pulse. Memory depends on the chunk size, not
+        the stimulus length, as long as every neuron's onsets keep moving:
+        onsets ahead of the slowest neuron wait in memory, so a neuron whose
+        intervals shrink to 0 (a map stuck on its fixed point 0, or a growth
+        rate of 1 or less) would hold back the whole batch for ever. Once a
+        neuron has max_pending onsets waiting, stream raises ValueError.
+
+        |  :param intervals: iterable of (K,) interval chunks, or (K, N)
+        |                    chunks for N neurons, e.g. chaotic_intervals()
+        |  :param X0: initial state, or (N, 4) initial states
+        |  :param dt: spacing of the integration grid, in ms
+        |  :param scale, amplitude, width: pulse train settings, as in Stimulus
+        |  :param tail: time to keep integrating after the last pulse ends, in ms
+        |  :param max_pending: onsets a neuron may hold waiting for the slowest one,
+        |                      at least the chunk size
+        |  :return: iterator of (t, V) per window, V (T,) or (N, T) when batched
+        """
+        stimulus, t = self.stimulus, self.t
+        X = None if X0 is None else np.asarray(X0, dtype=float)
+        t_start, last, pending, batched = 0.0, None, None, False
+
+        def window(onsets, n):
+            # integrate n steps of dt from t_start under onsets
+            self.stimulus = Stimulus([np.diff(o, prepend=0.0) for o in onsets],
+                                     amplitude=amplitude, width=width)
+            self.t = t_start + dt*np.arange(n + 1)
+            states = self._integrate(X)
+            # the window's first sample is the previous window's last
+            first = 0 if t_start == 0.0 else 1
+            V = states[:, first:, 0].astype(self.dtype, copy=False)
+            return states[:, -1], self.t[first:], (V if batched else V[0])
+
+        try:
+            for chunk in intervals:
+                batched = np.ndim(chunk) == 2
+                chunk = np.reshape(chunk, (len(chunk), -1)).T
+                if last is None:
+                    last = np.zeros(len(chunk))
+                    pending = [np.empty(0)] * len(chunk)
+                    X = np.broadcast_to(self.X0 if X is None else X, (len(chunk), 4))
+                new = [l + scale*np.cumsum(np.abs(c)) for l, c in zip(last, chunk)]
+                last = np.array([x[-1] if len(x) else l for x, l in zip(new, last)])
+                onsets = [np.concatenate((p, x)) for p, x in zip(pending, new)]
+                waiting = np.array([len(o) for o in onsets])
+                if waiting.max() > max_pending:
+                    raise ValueError('stimulus stalled at {0:g} ms: neuron {1} is not moving past it '
+                                     'and neuron {2} has {3} onsets waiting'.format(
+                                         last.min(), last.argmin(), waiting.argmax(), waiting.max()))
+
+                n = int(np.floor((last.min() - t_start) / dt))
+                if n < 1:
+                    pending = onsets
+                    continue
+                X, t_win, V = window(onsets, n)
+                yield t_win, V
+                t_start = t_win[-1]
+                pending = [o[o > t_start - width] for o in onsets]
+
+            if last is not None:
+                # flush the pulses past the earliest last onset, up to the
+                # end of the latest pulse and the tail after it
+                n = int(np.ceil((last.max() + width + tail - t_start) / dt - 1e-9))
+                if n >= 1:
+                    X, t_win, V = window(pending, n)
+                    yield t_win, V
+        finally:
+            self.stimulus, self.t = stimulus, t
+
+    def spike_times(self, X0=None, threshold=0.0):
+        """
+        Integrate over the span of self.t keeping only the upward crossings
+        of threshold by V, never the trajectory itself
+
+        'rush_larsen' checks every fixed step. Every other method steps the
+        matching solve_ivp solver (LSODA standing in for odeint) and refines
+        each crossing on that step's dense output.
+
+        |  :param X0: initial state, or (N, 4) initial states for a batched run
+        |  :param threshold: spike threshold, in mV
+        |  :return: spike times, or a list of N spike-time arrays when batched
+        """
+        X0 = np.asarray(self.X0 if X0 is None else X0, dtype=float)
+        t = np.asarray(self.t, dtype=float)
+        N = len(t) if t.ndim == 2 else len(np.atleast_2d(X0))
+        y0 = np.broadcast_to(X0, (N, 4)).ravel()
+        if self.method == 'rush_larsen':
+            idx, times = self._rush_larsen_spikes(y0, t.min(), t.max(), threshold)
+        else:
+            idx, times = self._ivp_spikes(y0, t.min(), t.max(), threshold)
+
+        order = np.lexsort((times, idx))
+        trains = np.split(times[order], np.cumsum(np.bincount(idx, minlength=N))[:-1])
+        return trains if X0.ndim == 2 or t.ndim == 2 else trains[0]
+
+    def _rush_larsen_spikes(self, y0, t0, t1, threshold):
+        """
+        Fixed-step crossing search, interpolating linearly within the step
+
+        |  :return: neuron indices and times of the crossings
+        """
+        X = np.reshape(y0, (-1, 4))
+        n_steps = max(int(np.ceil((t1 - t0) / self.dt - 1e-9)), 1)
+        dt = (t1 - t0) / n_steps
+        idx, times = [np.empty(0, int)], [np.empty(0)]
+        for i in range(n_steps):
+            t = t0 + i*dt
+            V = X[:, 0]
+            X = self.step(X, t, dt)
+            j = np.flatnonzero((V < threshold) & (X[:, 0] >= threshold))
+            if len(j):
+                idx.append(j)
+                times.append(t + dt*(threshold - V[j]) / (X[j, 0] - V[j]))
+        return np.concatenate(idx), np.concatenate(times)
+
+    def _ivp_spikes(self, y0, t0, t1, threshold):
+        """
+        Adaptive crossing search, refining each bracketing step by regula
+        falsi on the solver's dense output
+
+        As in _solve, the solver is restarted at every edge of the built-in
+        current steps.
+
+        |  :return: neuron indices and times of the crossings
+        """
+        idx, times = [np.empty(0, int)], [np.empty(0)]
+        bounds = [t0] + self._step_edges(t0, t1) + [t1]
+        for a, b in zip(bounds[:-1], bounds[1:]):
+            y0 = self._ivp_spikes_smooth(y0, a, b, threshold, idx, times)
+        return np.concatenate(idx), np.concatenate(times)
+
+    def _ivp_spikes_smooth(self, y0, t0, t1, threshold, idx, times):
+        """
+        _ivp_spikes from t0 to t1, with no step edges inside, appending to
+        idx and times
+
+        |  :return: state at t1
+        """
+        method = 'LSODA' if self.method == 'odeint' else self.method
+        solver = getattr(integrate, method)(lambda t, y: self.dALLdt(y, t, self), t0, y0, t1,
+                                            **self._ivp_options(y0, method))
+        while solver.status == 'running':
+            V = solver.y[0::4].copy()
+            message = solver.step()
+            if solver.status == 'failed':
+                raise RuntimeError(message)
+            j = np.flatnonzero((V < threshold) & (solver.y[0::4] >= threshold))
+            if not len(j):
+                continue
+            sol = solver.dense_output()
+            cols = np.arange(len(j))
+            lo, V_lo = np.full(len(j), solver.t_old), V[j]
+            hi, V_hi = np.full(len(j), solver.t), solver.y[4*j]
+            for _ in range(4):
+                tc = lo + (hi - lo)*(threshold - V_lo) / (V_hi - V_lo)
+                V_c = sol(tc)[4*j, cols]
+                below = V_c < threshold
+                lo, V_lo = np.where(below, tc, lo), np.where(below, V_c, V_lo)
+                hi, V_hi = np.where(below, hi, tc), np.where(below, V_hi, V_c)
+            idx.append(j)
+            times.append(lo + (hi - lo)*(threshold - V_lo) / (V_hi - V_lo))
+        return solver.y
 
 if __name__ == '__main__':
+    import seaborn
+    from HH_render import TraceRenderer
+
     runner = HodgkinHuxley()
-    runner.t = sp.arange(0, 2, 0.1)
+    runner.t = np.arange(0, 2, 0.1)
     main = runner.Main()
-    fig, ax = plt.subplots()
-    fig.set_tight_layout(True)
-
-    plt.title('Hodgkin-Huxley - Linear Evenly spaced')
-    line, = ax.plot(runner.t, main, 'k')
-    plt.ylabel('Membrane Potential (mV)')
-    plt.xlabel('Time (ms)')
-
-    def update(i):
-        label = 'Time (s), timestep {0}'.format(i)
-        print(label)
-
-        line.set_xdata(runner.t*i)
-        # Update the line and the axes (with a new xlabel). Return a tuple of
-        # "artists" that have to be redrawn for this frame.
-        ax.set_xlabel(label)
-        return runner.t, ax
-    Writer = animation.writers['ffmpeg']
-    writer = Writer(fps=5, metadata=dict(artist='Fernando Espinosa'))
-    anim = FuncAnimation(fig, update, frames=sp.arange(1, 10), interval=100)
-    anim.save('HH_even_linear.mp4', writer=writer)
-    clip = mp.VideoFileClip('HH_even_linear.mp4')
-    clip.write_gif('HH_even_linear.gif')
-    # plt.show()
+    with TraceRenderer() as renderer:
+        renderer.render(runner.t, main, 'Hodgkin-Huxley - Linear Evenly spaced',
+                        ['HH_even_linear.mp4', 'HH_even_linear.gif'], 10)
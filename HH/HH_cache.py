@@ -0,0 +1,128 @@
+import hashlib
+import os
+import numpy as np
+
+
+class SimulationCache():
+    """Content-addressed on-disk cache of HodgkinHuxley results
+
+    The key hashes everything a run depends on: the model constants, the
+    stimulus, the time grid, the initial state and the solver settings.
+    Entries are .npy files named by their key. The directory is kept under
+    max_bytes by evicting the least recently used entries, and a hit
+    refreshes the entry's modification time.
+    """
+
+    CONSTANTS = ('C_m', 'g_Na', 'g_K', 'g_L', 'E_Na', 'E_K', 'E_L')
+    """ Model constants that enter the key """
+
+    SETTINGS = ('method', 'use_jacobian', 'rtol', 'atol', 'dt', 'tabulated', 'V_table', 'dtype',
+                'step_times', 'step_currents')
+    """ Solver settings that enter the key """
+
+    def __init__(self, directory='.hh_cache', max_bytes=2**30):
+        """
+        |  :param directory: where entries live, created if missing
+        |  :param max_bytes: size bound of the directory
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    def key(self, runner, X0=None):
+        """
+        Hex digest identifying the result of runner.integrate(X0)
+        """
+        h = hashlib.sha256()
+        h.update(type(runner).__qualname__.encode())
+        for name in self.CONSTANTS:
+            h.update(np.asarray(getattr(runner, name), dtype=float).tobytes())
+        h.update(repr([getattr(runner, name, None) for name in self.SETTINGS]).encode())
+        for a in (runner.X0 if X0 is None else X0, runner.t):
+            a = np.asarray(a, dtype=float)
+            h.update(repr(a.shape).encode())
+            h.update(a.tobytes())
+        stimulus = runner.stimulus
+        if stimulus is None:
+            h.update(b'steps')
+        else:
+            h.update(type(stimulus).__qualname__.encode())
+            h.update(repr((stimulus.width, stimulus.batched)).encode())
+            h.update(np.asarray(stimulus.amplitude, dtype=float).tobytes())
+            for onsets in stimulus.onsets:
+                h.update(repr(len(onsets)).encode())
+                h.update(onsets.tobytes())
+        return h.hexdigest()
+
+    def integrate(self, runner, X0=None):
+        """
+        runner.integrate(X0), read from the cache when possible
+        """
+        path = os.path.join(self.directory, self.key(runner, X0) + '.npy')
+        try:
+            X = np.load(path)
+        except (IOError, ValueError):
+            pass
+        else:
+            self.hits += 1
+            os.utime(path, None)
+            return X
+
+        self.misses += 1
+        X = runner.integrate(X0)
+        tmp = '{0}.{1}.tmp'.format(path, os.getpid())
+        with open(tmp, 'wb') as f:
+            np.save(f, X)
+        os.replace(tmp, path)
+        self.evict()
+        return X
+
+    def Main(self, runner, X0=None):
+        """
+        runner.Main(X0), read from the cache when possible
+        """
+        return self.integrate(runner, X0)[..., 0]
+
+    def _entries(self):
+        """(mtime, size, path) of every entry"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.npy'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        """
+        Remove least recently used entries until the cache fits in max_bytes
+        """
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                # already evicted by another process sharing the directory
+                pass
+            else:
+                self.evictions += 1
+            total -= size
+
+    def stats(self):
+        """
+        |  :return: hits, misses, evictions, entries and bytes on disk
+        """
+        entries = self._entries()
+        return dict(hits=self.hits, misses=self.misses, evictions=self.evictions,
+                    entries=len(entries), bytes=sum(size for _, size, _ in entries))
@@ -0,0 +1,47 @@
+import os
+import pickle
+import numpy as np
+
+
+class Checkpoint():
+    """Snapshot of a long job's progress, written atomically
+
+    A snapshot is one pickle of whatever state the job hands to save(),
+    plus the state of numpy's global random generator. It is written to a
+    temporary file, flushed to disk and renamed over the previous one, so a
+    job killed mid-write leaves the last complete snapshot behind.
+    """
+
+    def __init__(self, path):
+        """
+        |  :param path: snapshot file
+        """
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def save(self, **state):
+        """
+        Replace the snapshot with state and the current global RNG state
+
+        |  :param state: picklable values, e.g. arrays and generation lists
+        """
+        state['rng'] = np.random.get_state()
+        tmp = '{0}.{1}.tmp'.format(self.path, os.getpid())
+        with open(tmp, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def load(self):
+        """
+        Read the snapshot back and restore the global RNG it was saved with
+
+        |  :return: the state passed to save()
+        """
+        with open(self.path, 'rb') as f:
+            state = pickle.load(f)
+        np.random.set_state(state.pop('rng'))
+        return state
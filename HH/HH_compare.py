@@ -0,0 +1,133 @@
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+
+from HH_base import HodgkinHuxley
+from HH_spike_stats import ragged, summary, train_index
+from HH_stimulus import Stimulus
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Chaos'))
+from logistic_map import chaotic_intervals
+
+
+def even_intervals(rng, n, k):
+    """Evenly spaced pulses, the linear baseline of HH_base.py"""
+    return np.ones((n, k))
+
+
+def poisson_intervals(rng, n, k):
+    """Exponential(1) intervals, those of a Poisson process; HH_poisson.py
+    uses Poisson counts instead, a third of which are 0"""
+    return rng.exponential(1, (n, k))
+
+
+def gaussian_intervals(rng, n, k):
+    """|N(0, 1)| intervals, as in HH_gaussian.py"""
+    return np.abs(rng.normal(0, 1, (n, k)))
+
+
+def logistic_intervals(rng, n, k, rate=3.9):
+    """Logistic map orbits at a chaotic growth rate, one random initial population per sample"""
+    pops = rng.uniform(0.05, 0.95, n)
+    return next(chaotic_intervals(np.full(n, rate), chunk_size=k, initial_pop=pops)).T
+
+
+FAMILIES = {'even': even_intervals, 'poisson': poisson_intervals,
+            'gaussian': gaussian_intervals, 'chaotic': logistic_intervals}
+""" Interval generator of every stimulus family, each taking (rng, n, k) """
+
+
+def compare(n_samples=1000, n_intervals=50, seed=0, mean_interval=10.0, amplitude=20.0, width=1.0,
+            threshold=0.0, t_settle=50.0, families=None, runner=None):
+    """
+    Drive one batch of neurons with every stimulus family and compare
+    their spike trains with HH_spike_stats.summary
+
+    Each family draws n_samples sequences of n_intervals intervals from a
+    RandomState seeded with seed, rescaled to a mean of mean_interval ms
+    and shifted so that none is shorter than the pulse width: closer pulses
+    would overlap and merge into one. Every sequence thus delivers all of
+    its pulses, and the families differ in the timing of their pulses only,
+    not in their number or average rate. All sequences are simulated
+    together in one batched run that keeps spike times, not traces. Only
+    spikes after t_settle count, so the start-up spike from X0 does not.
+
+    The default runner uses HodgkinHuxley.CLASSIC: with the default
+    constants the pulses never reach threshold.
+
+    |  :param n_samples: sequences per family
+    |  :param n_intervals: pulses per sequence
+    |  :param seed: seed of every family's RandomState
+    |  :param mean_interval: mean inter-pulse interval, in ms, more than width
+    |  :param amplitude, width: pulse settings, as in Stimulus
+    |  :param threshold: spike threshold, in mV
+    |  :param t_settle: transient to discard, in ms
+    |  :param families: names from FAMILIES, None for all of them
+    |  :param runner: HodgkinHuxley to simulate with, None for a fixed-step
+    |                 tabulated one with the classic reversal potentials
+    |  :return: JSON-ready report
+    """
+    if mean_interval <= width:
+        raise ValueError('mean_interval {0} is not longer than the pulse width {1}'.format(mean_interval, width))
+    names = list(FAMILIES) if families is None else list(families)
+    intervals = []
+    for name in names:
+        x = FAMILIES[name](np.random.RandomState(seed), n_samples, n_intervals)
+        intervals.append(width + x * ((mean_interval - width) / x.mean()))
+    intervals = np.concatenate(intervals)
+
+    if runner is None:
+        runner = HodgkinHuxley()
+        runner.method = 'rush_larsen'
+        runner.tabulated = True
+        runner.dt = 0.025
+        for name, value in HodgkinHuxley.CLASSIC.items():
+            setattr(runner, name, value)
+    runner.stimulus = Stimulus(intervals, amplitude=amplitude, width=width)
+    duration = float(intervals.sum(axis=1).max() + 2*mean_interval)
+    runner.t = np.array([0.0, duration])
+
+    start = time.time()
+    trains = runner.spike_times(np.tile(runner.X0, (len(intervals), 1)), threshold)
+    elapsed = time.time() - start
+
+    report = dict(settings=dict(n_samples=n_samples, n_intervals=n_intervals, seed=seed,
+                                mean_interval=mean_interval, amplitude=amplitude, width=width,
+                                threshold=threshold, t_settle=t_settle, duration=duration,
+                                method=runner.method,
+                                dt=runner.dt, neurons=len(intervals), seconds=elapsed),
+                  families={})
+    for i, name in enumerate(names):
+        values, offsets = ragged(trains[i*n_samples:(i + 1)*n_samples])
+        # keep the spikes after t_settle, timed from t_settle
+        late = values >= t_settle
+        counts = np.bincount(train_index(offsets)[late], minlength=n_samples)
+        values, offsets = values[late] - t_settle, np.concatenate(([0], np.cumsum(counts)))
+        report['families'][name] = summary(values, offsets, duration - t_settle, window=5*mean_interval)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare even, Poisson, Gaussian and chaotic stimulus intervals')
+    parser.add_argument('--samples', type=int, default=1000, help='sequences per family')
+    parser.add_argument('--intervals', type=int, default=50, help='pulses per sequence')
+    parser.add_argument('--seed', type=int, default=0, help='seed shared by every family')
+    parser.add_argument('--mean-interval', type=float, default=10.0, help='mean inter-pulse interval, in ms')
+    parser.add_argument('--amplitude', type=float, default=20.0, help='pulse height, in uA/cm^2')
+    parser.add_argument('--width', type=float, default=1.0, help='pulse duration, in ms')
+    parser.add_argument('--threshold', type=float, default=0.0, help='spike threshold, in mV')
+    parser.add_argument('--t-settle', type=float, default=50.0, help='transient to discard, in ms')
+    parser.add_argument('--families', nargs='+', choices=list(FAMILIES), default=None)
+    parser.add_argument('--output', default='HH_compare.json', help='JSON report to write')
+    args = parser.parse_args()
+
+    report = compare(args.samples, args.intervals, args.seed, args.mean_interval, args.amplitude,
+                     args.width, args.threshold, args.t_settle, args.families)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print('{0} neurons in {1:.1f} s'.format(report['settings']['neurons'], report['settings']['seconds']))
+    for name, stats in report['families'].items():
+        print('{0:>9}: {1}'.format(name, stats))
@@ -0,0 +1,142 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+import numpy as np
+
+
+def solver_stats(info):
+    """
+    Summarize HodgkinHuxley.solver_info into a few JSON-ready numbers
+
+    For odeint the per-output-point arrays become totals and step size
+    extremes, plus the number of switches between the non-stiff (Adams)
+    and stiff (BDF) methods and the fraction of the run spent stiff.
+
+    |  :param info: solver_info of the latest solve, or None
+    |  :return: dict of plain ints and floats
+    """
+    if info is None:
+        return {}
+    if 'mused' not in info:
+        return {k: int(v) for k, v in info.items()}
+    hu = info['hu'][info['hu'] > 0]
+    mused = info['mused'][info['mused'] > 0]
+    return dict(nst=int(info['nst'][-1]), nfe=int(info['nfe'][-1]), nje=int(info['nje'][-1]),
+                hu_min=float(hu.min()) if len(hu) else None,
+                hu_median=float(np.median(hu)) if len(hu) else None,
+                hu_max=float(hu.max()) if len(hu) else None,
+                method_switches=int(np.count_nonzero(np.diff(mused))),
+                stiff_fraction=float(np.mean(mused == 2)) if len(mused) else None,
+                message=info.get('message'))
+
+
+class Instrument():
+    """Opt-in profiler of HodgkinHuxley runs
+
+    attach() shadows the runner's dALLdt with a counting wrapper and turns
+    on its full_output, so every solve leaves its step statistics behind.
+    Each run() block becomes one record holding its labels, the RHS call
+    count, the solver statistics and the seconds spent in every phase().
+    Records are appended to a JSON lines log as they finish, so processes
+    sharing a log file can each write their own runs.
+    """
+
+    def __init__(self, path=None):
+        """
+        |  :param path: JSON lines file to append every record to, None to only keep them in records
+        """
+        self.path = path
+        self.records = []
+        self.rhs_calls = 0
+        self._record = None
+
+    def attach(self, runner):
+        """
+        Count runner's RHS evaluations and keep its solver statistics
+
+        |  :param runner: HodgkinHuxley instance
+        |  :return: runner
+        """
+        dALLdt = type(runner).dALLdt
+
+        def counted(X, t, model):
+            self.rhs_calls += 1
+            return dALLdt(X, t, model)
+
+        runner.dALLdt = counted
+        runner.full_output = True
+        return runner
+
+    def detach(self, runner):
+        """Restore the runner's own dALLdt and settings"""
+        runner.__dict__.pop('dALLdt', None)
+        runner.__dict__.pop('full_output', None)
+
+    @contextmanager
+    def run(self, runner=None, **labels):
+        """
+        Record one run, e.g. one generation or one chunk of generations
+
+        |  :param runner: attached HodgkinHuxley whose solver_info to keep
+        |  :param labels: JSON-ready fields identifying the run
+        |  :return: the record, whose 'phases' dict can also be filled directly
+        """
+        record = dict(labels, phases={})
+        self._record, calls, start = record, self.rhs_calls, time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['total'] = time.perf_counter() - start
+            record['rhs_calls'] = self.rhs_calls - calls
+            if runner is not None:
+                record['solver'] = solver_stats(runner.solver_info)
+            self._record = None
+            self.records.append(record)
+            if self.path is not None:
+                with open(self.path, 'a') as f:
+                    f.write(json.dumps(record) + '\n')
+
+    @contextmanager
+    def phase(self, name):
+        """Add the seconds spent in the block to phase name of the current run"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            phases = self._record['phases']
+            phases[name] = phases.get(name, 0.0) + time.perf_counter() - start
+
+    @staticmethod
+    def load(path):
+        """Records of a JSON lines log"""
+        with open(path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    @staticmethod
+    def slowest(records, phase='integrate', count=10):
+        """
+        The count records spending longest in phase, slowest first
+        """
+        return sorted(records, key=lambda r: -r['phases'].get(phase, 0.0))[:count]
+
+
+if __name__ == '__main__':
+    import sys
+    from HH_base import HodgkinHuxley
+
+    if len(sys.argv) > 1 and os.path.exists(sys.argv[1]):
+        # summarize a log written by e.g. HH_chaotic_1000gen.py --instrument
+        for r in Instrument.slowest(Instrument.load(sys.argv[1])):
+            print(json.dumps(r))
+    else:
+        instrument = Instrument()
+        runner = instrument.attach(HodgkinHuxley())
+        runner.t = np.arange(0, 450, 0.1)
+        for method in ('odeint', 'LSODA', 'BDF', 'rush_larsen'):
+            runner.method = method
+            with instrument.run(runner, method=method):
+                with instrument.phase('integrate'):
+                    runner.integrate()
+        for r in instrument.records:
+            print(json.dumps(r))
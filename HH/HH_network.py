@@ -0,0 +1,131 @@
+import numpy as np
+from scipy import sparse
+
+from HH_base import HodgkinHuxley
+
+
+def random_connectivity(N, in_degree=100, weight=1.0, inhibitory=0.2, g_inh=4.0, seed=None):
+    """
+    Sparse random connectivity with a fixed in-degree and no autapses
+
+    |  :param N: number of neurons
+    |  :param in_degree: presynaptic partners of every neuron
+    |  :param weight: excitatory synaptic weight, in uA/cm^2 per unit activation
+    |  :param inhibitory: fraction of neurons, the last ones, that inhibit
+    |  :param g_inh: inhibitory weight relative to the excitatory one
+    |  :param seed: seed of the random partner choice
+    |  :return: (N, N) CSR matrix, W[i, j] the synapse from neuron j onto neuron i
+    """
+    rng = np.random.RandomState(seed)
+    post = np.repeat(np.arange(N), in_degree)
+    # draw from the N-1 other neurons, skipping the neuron itself
+    pre = rng.randint(N - 1, size=N*in_degree)
+    pre += pre >= post
+    w = np.where(pre >= N - int(round(inhibitory*N)), -g_inh*weight, weight)
+    return sparse.csr_matrix((w, (post, pre)), shape=(N, N))
+
+
+class Network():
+    """Population of HodgkinHuxley neurons coupled by exponential synapses
+
+    Every neuron carries a synaptic activation s that jumps by 1 when it
+    spikes and decays with time constant tau_syn. The current into neuron
+    i is sum_j W[i, j]*s[j], added to the external drive of the model's
+    stimulus (a batched Stimulus gives each neuron its own pulse train).
+    All activations share one decay, so the current decays with them and
+    each step only needs the mat-vec of W with the columns of the neurons
+    that just spiked. The neurons take Rush-Larsen steps of the model's
+    kinetics, so the cost per step is linear in the number of neurons and
+    in the synapses of the spiking ones.
+    """
+
+    tau_syn = 5.0
+    """ Decay time constant of the synaptic activations, in ms """
+
+    threshold = 0.0
+    """ Upward crossing of V that counts as a spike, in mV """
+
+    def __init__(self, W, model=None):
+        """
+        |  :param W: (N, N) synaptic weights, W[i, j] from neuron j onto
+        |            neuron i, in uA/cm^2 per unit activation
+        |  :param model: HodgkinHuxley giving the kinetics, constants,
+        |                stimulus and step size dt
+        """
+        self.W = sparse.csc_matrix(W)
+        self.model = HodgkinHuxley() if model is None else model
+
+    def __len__(self):
+        return self.W.shape[0]
+
+    def run(self, duration, X0=None, record=None, record_every=1):
+        """
+        Simulate the network from t = 0, keeping spikes rather than traces
+
+        |  :param duration: simulated time, in ms
+        |  :param X0: initial state (V, m, h, n), or (N, 4) initial states
+        |  :param record: indices of neurons whose V to keep, in model.dtype, None for none
+        |  :param record_every: keep V every record_every steps
+        |  :return: spiking neuron indices and spike times in time order,
+        |           and the recorded (t, V), V of shape (len(t), len(record))
+        """
+        model = self.model
+        N = len(self)
+        X = np.array(np.broadcast_to(model.X0 if X0 is None else X0, (N, 4)), dtype=float)
+        I_syn = np.zeros(N)
+        dt = model.dt
+        decay = np.exp(-dt / self.tau_syn)
+        n_steps = int(np.ceil(duration / dt - 1e-9))
+
+        record = np.empty(0, int) if record is None else np.asarray(record)
+        t_rec = dt*np.arange(0, n_steps + 1, record_every)
+        V_rec = np.empty((len(t_rec), len(record)), dtype=model.dtype)
+        V_rec[0] = X[record, 0]
+
+        idx, times = [np.empty(0, int)], [np.empty(0)]
+        for i in range(n_steps):
+            t = i*dt
+            V = X[:, 0]
+            X = model.step(X, t, dt, I_syn)
+            I_syn *= decay
+            j = np.flatnonzero((V < self.threshold) & (X[:, 0] >= self.threshold))
+            if len(j):
+                I_syn += self.W[:, j] @ np.ones(len(j))
+                idx.append(j)
+                times.append(t + dt*(self.threshold - V[j]) / (X[j, 0] - V[j]))
+            if (i + 1) % record_every == 0:
+                V_rec[(i + 1) // record_every] = X[record, 0]
+        return np.concatenate(idx), np.concatenate(times), t_rec, V_rec
+
+
+if __name__ == '__main__':
+    import os
+    import sys
+    import time
+    from HH_stimulus import Stimulus
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Chaos'))
+    from logistic_map import chaotic_intervals
+
+    N = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    duration = 100.0
+    model = HodgkinHuxley()
+    model.tabulated = True
+    model.dt = 0.025
+    # with the default constants the neurons stop firing after the initial
+    # transient and the synapses would never be exercised
+    for name, value in HodgkinHuxley.CLASSIC.items():
+        setattr(model, name, value)
+    # every neuron driven by its own chaotic logistic map orbit
+    rates = np.linspace(3.6, 4.0, N)
+    intervals = next(chaotic_intervals(rates, chunk_size=int(duration)))
+    model.stimulus = Stimulus(intervals.T, amplitude=20.0, scale=10.0)
+
+    net = Network(random_connectivity(N, in_degree=min(100, N - 1), seed=0), model)
+    start = time.time()
+    idx, times, t, V = net.run(duration, record=[0])
+    late = times > 20.0
+    print('{0} neurons, {1} synapses: {2} spikes in {3:.1f} ms of network time, {4:.1f} s'.format(
+        N, net.W.nnz, len(idx), duration, time.time() - start))
+    print('{0:.1f} spikes per neuron after the first 20 ms, {1} neurons firing'.format(
+        late.sum() / N, len(np.unique(idx[late]))))
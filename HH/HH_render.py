@@ -0,0 +1,199 @@
+import os
+import subprocess
+import time
+import numpy as np
+import matplotlib
+from PIL import Image
+from matplotlib.animation import FFMpegWriter, FuncAnimation
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+
+class FFMpegEncoder():
+    """Pipe raw RGBA frames into an ffmpeg process encoding H.264"""
+
+    def __init__(self, path, size, fps=5, metadata=None):
+        """
+        |  :param path: output file
+        |  :param size: (width, height) of the frames, in pixels
+        """
+        cmd = [matplotlib.rcParams['animation.ffmpeg_path'], '-y', '-loglevel', 'error',
+               '-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', '{0}x{1}'.format(*size),
+               '-r', str(fps), '-i', '-', '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+               '-vcodec', 'libx264', '-pix_fmt', 'yuv420p']
+        for k, v in (metadata or {}).items():
+            cmd += ['-metadata', '{0}={1}'.format(k, v)]
+        self.path = path
+        self.proc = subprocess.Popen(cmd + [path], stdin=subprocess.PIPE)
+
+    def write(self, frame):
+        self.proc.stdin.write(np.ascontiguousarray(frame).data)
+
+    def close(self):
+        self.proc.stdin.close()
+        if self.proc.wait():
+            raise RuntimeError('ffmpeg failed writing {0}'.format(self.path))
+
+
+class GifEncoder():
+    """Quantize RGBA frames as they arrive and write them as one GIF"""
+
+    def __init__(self, path, size, fps=5, metadata=None):
+        self.path = path
+        self.duration = int(round(1000.0 / fps))
+        self.images = []
+
+    def write(self, frame):
+        self.images.append(Image.fromarray(np.asarray(frame)[..., :3]).quantize())
+
+    def close(self):
+        if self.images:
+            self.images[0].save(self.path, save_all=True, append_images=self.images[1:],
+                                duration=self.duration, loop=0)
+        self.images = []
+
+
+ENCODERS = {'.mp4': FFMpegEncoder, '.gif': GifEncoder}
+""" Encoder for each output file extension """
+
+
+def encode(frames, encoders, timings=None):
+    """
+    Hand every frame to every encoder, so each frame is rendered only once
+
+    |  :param frames: iterable of (H, W, 4) RGBA arrays
+    |  :param encoders: objects with write(frame) and close()
+    |  :param timings: dict to add the seconds spent producing frames
+    |                  ('render') and encoding them ('encode') to
+    """
+    render = encode = 0.0
+    frames = iter(frames)
+    try:
+        while True:
+            start = time.perf_counter()
+            frame = next(frames, None)
+            render += time.perf_counter() - start
+            if frame is None:
+                break
+            start = time.perf_counter()
+            for encoder in encoders:
+                encoder.write(frame)
+            encode += time.perf_counter() - start
+    finally:
+        start = time.perf_counter()
+        for encoder in encoders:
+            encoder.close()
+        encode += time.perf_counter() - start
+        if timings is not None:
+            timings['render'] = timings.get('render', 0.0) + render
+            timings['encode'] = timings.get('encode', 0.0) + encode
+
+
+class TraceRenderer():
+    """Headless renderer animating many membrane potential traces
+
+    One figure, one Line2D and one frame label live for the renderer's
+    whole life; each run only swaps their data. The figure is attached
+    straight to an Agg canvas, bypassing pyplot, so nothing accumulates in
+    the pyplot figure registry. Frames are blitted: the static axes are
+    drawn once per run and only the animated artists are redrawn per frame.
+    """
+
+    def __init__(self, figsize=(6.4, 4.8), dpi=100, fps=5, artist='Fernando Espinosa'):
+        self.fps = fps
+        self.metadata = dict(artist=artist)
+        self.fig = Figure(figsize=figsize, dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot(1, 1, 1)
+        self.line, = self.ax.plot([], [], 'k', animated=True)
+        self.label = self.ax.text(0.02, 0.95, '', transform=self.ax.transAxes, animated=True)
+        self.ax.set_ylabel('Membrane Potential (mV)')
+        self.ax.set_xlabel('Time (ms)')
+        self.ax.set_title(' ')
+        self.fig.tight_layout()
+        self._background = None
+        self._t = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def set_run(self, t, V, title):
+        """
+        Point the persistent artists at a new run and redraw the static parts
+
+        |  :param t: time grid
+        |  :param V: membrane potential at t
+        |  :param title: axes title
+        """
+        self._t = np.asarray(t)
+        self.line.set_data(self._t, V)
+        self.ax.set_title(title)
+        self.ax.set_xlim(self._t.min(), self._t.max())
+        lo, hi = np.min(V), np.max(V)
+        pad = 0.05 * (hi - lo) if hi > lo else 1.0
+        self.ax.set_ylim(lo - pad, hi + pad)
+        self.canvas.draw()
+        self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+
+    def update(self, i):
+        """
+        Frame i: the trace stretched i times along the time axis
+
+        |  :return: the artists that changed
+        """
+        self.line.set_xdata(self._t * i)
+        self.label.set_text('Time (ms), timestep {0}'.format(i))
+        return self.line, self.label
+
+    def frames(self, n_frames):
+        """
+        Blit frames 1 .. n_frames-1 of the current run
+
+        |  :return: iterator of (H, W, 4) RGBA views of the canvas buffer,
+        |           only valid until the next frame is drawn
+        """
+        for i in range(1, n_frames):
+            self.canvas.restore_region(self._background)
+            for a in self.update(i):
+                self.ax.draw_artist(a)
+            self.canvas.blit(self.fig.bbox)
+            yield np.asarray(self.canvas.buffer_rgba())
+
+    def render(self, t, V, title, paths, n_frames, timings=None):
+        """
+        Render a run once and stream its frames to every output in one pass,
+        e.g. an mp4 and a gif, with no intermediate file to decode
+
+        |  :param paths: output files, encoder chosen by extension (see ENCODERS)
+        |  :param n_frames: frames 1 .. n_frames-1 are rendered
+        |  :param timings: dict to add the render and encode seconds to, see encode()
+        """
+        start = time.perf_counter()
+        self.set_run(t, V, title)
+        if timings is not None:
+            timings['render'] = timings.get('render', 0.0) + time.perf_counter() - start
+        size = self.canvas.get_width_height()
+        encoders = [ENCODERS[os.path.splitext(p)[1].lower()](p, size, self.fps, self.metadata)
+                    for p in paths]
+        encode(self.frames(n_frames), encoders, timings)
+
+    def animate(self, t, V, title, path, n_frames):
+        """
+        Render a run to a video file through FuncAnimation with blitting
+
+        |  :param path: output file, e.g. mp4s/HH_chaotic1.mp4
+        |  :param n_frames: frames 1 .. n_frames-1 are rendered
+        """
+        self.set_run(t, V, title)
+        anim = FuncAnimation(self.fig, self.update, frames=np.arange(1, n_frames),
+                             init_func=lambda: (self.line, self.label), interval=100, blit=True)
+        anim.save(path, writer=FFMpegWriter(fps=self.fps, metadata=self.metadata))
+
+    def close(self):
+        """Release the figure and its canvas"""
+        self.fig.clear()
+        self._background = None
+        self.fig = self.canvas = self.ax = self.line = self.label = None
@@ -0,0 +1,185 @@
+import numpy as np
+from scipy.ndimage import gaussian_filter1d
+
+# Spike trains of many runs are held as one flat array of spike times,
+# train by train, plus offsets: train i is values[offsets[i]:offsets[i+1]],
+# so len(offsets) is one more than the number of trains. Every statistic
+# below works on that layout with whole-array operations, never looping
+# over trains. Times are in ms, rates in Hz.
+
+
+def ragged(trains):
+    """
+    Flat values and offsets of a list of spike-time arrays, e.g. the
+    output of HodgkinHuxley.spike_times for a batched run
+
+    |  :param trains: spike-time arrays, one per train
+    |  :return: values, offsets
+    """
+    counts = np.fromiter((len(x) for x in trains), int, len(trains))
+    values = np.concatenate([np.asarray(x, dtype=float) for x in trains]) if len(trains) else np.empty(0)
+    return values, np.concatenate(([0], np.cumsum(counts)))
+
+
+def from_events(idx, times, n_trains):
+    """
+    Flat values and offsets of (neuron, time) spike events, e.g. the output
+    of Network.run, each train sorted in time
+
+    |  :param idx: train of each spike
+    |  :param times: time of each spike
+    |  :param n_trains: number of trains, including silent ones
+    |  :return: values, offsets
+    """
+    order = np.lexsort((times, idx))
+    counts = np.bincount(idx, minlength=n_trains)
+    return np.asarray(times, dtype=float)[order], np.concatenate(([0], np.cumsum(counts)))
+
+
+def train_index(offsets):
+    """Train of every value"""
+    return np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+
+def spike_counts(offsets):
+    """Spikes per train"""
+    return np.diff(offsets)
+
+
+def isi(values, offsets):
+    """
+    Inter-spike intervals of every train
+
+    |  :return: ISI values and offsets, max(count - 1, 0) intervals per train
+    """
+    tid = train_index(offsets)
+    same = tid[1:] == tid[:-1]
+    n = np.maximum(np.diff(offsets) - 1, 0)
+    return np.diff(values)[same], np.concatenate(([0], np.cumsum(n)))
+
+
+def _mean_std(x, tid, n_trains):
+    """Per-train mean and population std of x grouped by tid, NaN for empty groups"""
+    k = np.bincount(tid, minlength=n_trains)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(tid, x, minlength=n_trains) / k
+        var = np.bincount(tid, (x - mean[tid])**2, minlength=n_trains) / k
+    return mean, np.sqrt(var)
+
+
+def isi_histogram(values, offsets, bins=50, range=None, pooled=False):
+    """
+    Histograms of the inter-spike intervals
+
+    |  :param bins: number of bins, or bin edges
+    |  :param range: (min, max) of the bins, default the ISI range
+    |  :param pooled: one histogram over all trains instead of one per train
+    |  :return: (n_trains, n_bins) counts, or (n_bins,) when pooled, and the bin edges
+    """
+    d, d_off = isi(values, offsets)
+    edges = np.histogram_bin_edges(d, bins, range)
+    if pooled:
+        return np.histogram(d, edges)[0], edges
+    nb = len(edges) - 1
+    b = np.searchsorted(edges, d, side='right') - 1
+    b[d == edges[-1]] = nb - 1
+    keep = (b >= 0) & (b < nb)
+    tid = train_index(d_off)[keep]
+    hist = np.bincount(tid*nb + b[keep], minlength=(len(offsets) - 1)*nb)
+    return hist.reshape(-1, nb), edges
+
+
+def cv(values, offsets):
+    """
+    Coefficient of variation of every train's inter-spike intervals
+
+    |  :return: std/mean per train, NaN for trains with fewer than 2 intervals
+    """
+    d, d_off = isi(values, offsets)
+    mean, std = _mean_std(d, train_index(d_off), len(offsets) - 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        out = std / mean
+    out[np.diff(d_off) < 2] = np.nan
+    return out
+
+
+def window_counts(values, offsets, window, t_start=0.0, t_stop=None):
+    """
+    Spike counts of every train in consecutive windows
+
+    |  :param window: window length, in ms
+    |  :param t_start, t_stop: span to cover, t_stop defaulting to the last spike;
+    |                          a last partial window is dropped
+    |  :return: (n_trains, n_windows) counts
+    """
+    if t_stop is None:
+        t_stop = values.max() if len(values) else t_start
+    # no windows when the span is shorter than one window, or negative
+    n_win = max(int(np.floor((t_stop - t_start) / window + 1e-9)), 0)
+    w = np.floor((values - t_start) / window).astype(int)
+    keep = (w >= 0) & (w < n_win)
+    tid = train_index(offsets)[keep]
+    counts = np.bincount(tid*n_win + w[keep], minlength=(len(offsets) - 1)*n_win)
+    return counts.reshape(len(offsets) - 1, n_win)
+
+
+def fano(values, offsets, window, t_start=0.0, t_stop=None):
+    """
+    Fano factor of every train's spike counts across windows
+
+    |  :param window: window length in ms, or a sequence of lengths
+    |  :return: variance/mean of the counts per train, NaN for silent trains,
+    |           (n_trains,) or (len(window), n_trains)
+    """
+    if np.ndim(window):
+        return np.array([fano(values, offsets, w, t_start, t_stop) for w in window])
+    counts = window_counts(values, offsets, window, t_start, t_stop)
+    n = counts.shape[1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = counts.sum(axis=1) / n
+        return ((counts - mean[:, None])**2).sum(axis=1) / n / mean
+
+
+def mean_rate(values, offsets, duration):
+    """
+    Mean firing rate of every train
+
+    |  :param duration: length of the runs, in ms
+    |  :return: rate per train, in Hz
+    """
+    return 1000.0 * spike_counts(offsets) / duration
+
+
+def instantaneous_rate(values, offsets, bin_width=1.0, t_start=0.0, t_stop=None, sigma=None):
+    """
+    Time-resolved firing rate of every train
+
+    |  :param bin_width: bin length, in ms
+    |  :param sigma: width of a Gaussian smoothing kernel, in ms, None for plain bins
+    |  :return: (n_trains, n_bins) rates in Hz, and the bin start times
+    """
+    counts = window_counts(values, offsets, bin_width, t_start, t_stop)
+    rate = counts * (1000.0 / bin_width)
+    if sigma is not None:
+        rate = gaussian_filter1d(rate, sigma / bin_width, axis=1, mode='constant')
+    return rate, t_start + bin_width*np.arange(counts.shape[1])
+
+
+def summary(values, offsets, duration, window=None):
+    """
+    JSON-ready population summary of the trains
+
+    |  :param duration: length of the runs, in ms
+    |  :param window: window of the per-train Fano factors, in ms, None to skip them
+    """
+    counts = spike_counts(offsets).astype(float)
+    mean = counts.mean() if len(counts) else 0.0
+    cvs = cv(values, offsets)
+    out = dict(trains=len(counts), mean_count=float(mean), std_count=float(counts.std()) if len(counts) else 0.0,
+               fano=float(counts.var() / mean) if mean > 0 else None,
+               rate_hz=float(1000.0 * mean / duration),
+               mean_isi_cv=float(np.nanmean(cvs)) if np.isfinite(cvs).any() else None)
+    if window is not None:
+        f = fano(values, offsets, window, 0.0, duration)
+        out['mean_window_fano'] = float(np.nanmean(f)) if np.isfinite(f).any() else None
+    return out
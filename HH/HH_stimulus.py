@@ -0,0 +1,78 @@
+import numpy as np
+
+
+class Stimulus():
+    """Pulse-train injected current driven by inter-stimulus intervals"""
+
+    def __init__(self, intervals, amplitude=10.0, width=1.0, scale=1.0, t0=0.0):
+        """
+        Turn interval sequences into pulse onset times
+
+        A single sequence drives one neuron. A list of N sequences, which may
+        differ in length, or an (N, K) array drives a batch of N neurons.
+
+        |  :param intervals: inter-stimulus intervals, or N sequences of them
+        |  :param amplitude: pulse height, in uA/cm^2
+        |  :param width: pulse duration, in ms
+        |  :param scale: ms per unit of interval, e.g. for logistic map populations
+        |  :param t0: time the first interval starts from, in ms
+        """
+        self.amplitude = amplitude
+        self.width = width
+        self.batched = len(intervals) > 0 and np.ndim(intervals[0]) > 0
+        trains = intervals if self.batched else [intervals]
+        self.onsets = [t0 + scale*np.cumsum(np.abs(np.asarray(x, dtype=float))) for x in trains]
+
+        # Every train lives in its own span-wide slot of one sorted key array,
+        # so a single searchsorted finds the latest onset of all N neurons.
+        # The leading -inf lets neurons without an earlier onset index it.
+        offset = -min(t0, 0.0)
+        last = max((x[-1] for x in self.onsets if len(x)), default=t0)
+        self._t_max = last + width + 0.5
+        self._shift = np.arange(len(trains)) * (self._t_max + offset + 0.5) + offset
+        self._keys = np.concatenate([[-np.inf]] + [x + s for x, s in zip(self.onsets, self._shift)])
+        self._first = 1 + np.concatenate(([0], np.cumsum([len(x) for x in self.onsets])[:-1]))
+
+    def __len__(self):
+        return len(self.onsets)
+
+    def __call__(self, t):
+        """
+        Injected current at time t
+
+        |  :param t: time, in ms
+        |  :return: current in uA/cm^2, an (N,) array for a batch
+        """
+        q = min(t, self._t_max) + self._shift
+        i = np.searchsorted(self._keys, q, side='right') - 1
+        on = (i >= self._first) & (q - self._keys[i] < self.width)
+        I = self.amplitude * on
+        return I if self.batched else I[0]
+
+
+class Current():
+    """Constant injected current switched on over [onset, offset)"""
+
+    def __init__(self, amplitude, onset=0.0, offset=np.inf):
+        """
+        |  :param amplitude: current in uA/cm^2, or an (N,) array for a batch
+        |                    of N neurons, e.g. the current axis of an F-I curve
+        |  :param onset: time the current switches on, in ms
+        |  :param offset: time the current switches off, in ms
+        """
+        self.amplitude = np.asarray(amplitude, dtype=float)
+        self.width = offset - onset
+        self.batched = self.amplitude.ndim > 0
+        self.onsets = [np.array([float(onset)])]
+
+    def __len__(self):
+        return len(self.amplitude) if self.batched else 1
+
+    def __call__(self, t):
+        """
+        Injected current at time t
+
+        |  :param t: time, in ms
+        |  :return: current in uA/cm^2, an (N,) array for a batch
+        """
+        return self.amplitude * (0.0 <= t - self.onsets[0][0] < self.width)
@@ -0,0 +1,104 @@
+import json
+import os
+import numpy as np
+from numpy.lib.format import open_memmap
+
+
+class TraceStore():
+    """Memory-mapped store of (V, m, h, n) traces for many runs
+
+    A store is a directory holding one preallocated (n_runs, T, 4) .npy
+    array, the shared time grid and a JSON index mapping (generation, rate,
+    stimulus kind) to the run's row. Opening a store maps the array rather
+    than reading it, so slicing pulls only the requested traces from disk.
+    """
+
+    FIELDS = ('V', 'm', 'h', 'n')
+    """ Order of the state variables along the last axis """
+
+    def __init__(self, path, mode='r'):
+        """
+        Open an existing store
+
+        |  :param path: store directory
+        |  :param mode: 'r' to read, 'r+' to fill in rows, e.g. from a worker process
+        """
+        self.path = path
+        self.traces = np.load(os.path.join(path, 'traces.npy'), mmap_mode=mode)
+        self.t = np.load(os.path.join(path, 't.npy'))
+        with open(os.path.join(path, 'index.json')) as f:
+            self._entries = [tuple(e) for e in json.load(f)['entries']]
+        self._offsets = {e[:3]: e[3] for e in self._entries}
+
+    @classmethod
+    def create(cls, path, n_runs, t, dtype=np.float32):
+        """
+        Preallocate a store for n_runs traces sampled on the grid t
+
+        |  :param dtype: float32 halves the disk footprint of float64 traces
+        """
+        if not os.path.exists(path):
+            os.makedirs(path)
+        open_memmap(os.path.join(path, 'traces.npy'), mode='w+', dtype=dtype,
+                    shape=(n_runs, len(t), len(cls.FIELDS))).flush()
+        np.save(os.path.join(path, 't.npy'), np.asarray(t, dtype=float))
+        with open(os.path.join(path, 'index.json'), 'w') as f:
+            json.dump({'fields': cls.FIELDS, 'entries': []}, f)
+        return cls(path, 'r+')
+
+    def __len__(self):
+        return len(self._entries)
+
+    def keys(self):
+        """(generation, rate, kind) of every indexed run, in row order"""
+        return [e[:3] for e in self._entries]
+
+    def reserve(self, keys):
+        """
+        Index the next len(keys) rows without writing them, so workers can
+        fill them in later through TraceStore(path, 'r+')
+
+        |  :param keys: (generation, rate, kind) of each run
+        |  :return: row offsets of the runs
+        """
+        start = len(self._entries)
+        if start + len(keys) > len(self.traces):
+            raise ValueError('store holds {0} runs, {1} requested'.format(
+                len(self.traces), start + len(keys)))
+        for i, (generation, rate, kind) in enumerate(keys):
+            key = (generation, None if rate is None else float(rate), kind)
+            self._entries.append(key + (start + i,))
+            self._offsets[key] = start + i
+        with open(os.path.join(self.path, 'index.json'), 'w') as f:
+            json.dump({'fields': self.FIELDS, 'entries': self._entries}, f)
+        return np.arange(start, start + len(keys))
+
+    def append(self, X, keys):
+        """
+        Write states from HodgkinHuxley.integrate into the next rows
+
+        |  :param X: (T, 4) states, or (N, T, 4) for N runs
+        |  :param keys: (generation, rate, kind) of each run
+        """
+        X = np.reshape(X, (-1,) + self.traces.shape[1:])
+        rows = self.reserve(keys)
+        self.traces[rows[0]:rows[-1] + 1] = X
+        self.traces.flush()
+
+    def offset(self, generation, rate, kind):
+        """Row of a run"""
+        return self._offsets[(generation, None if rate is None else float(rate), kind)]
+
+    def __getitem__(self, key):
+        """
+        Traces of a run by (generation, rate, kind), or rows by index or slice
+
+        |  :return: memory-mapped view, (T, 4) per run
+        """
+        if isinstance(key, tuple) and len(key) == 3 and isinstance(key[2], str):
+            return self.traces[self.offset(*key)]
+        return self.traces[key]
+
+    def field(self, name):
+        """Memory-mapped (n_runs, T) view of one of V, m, h or n"""
+        return self.traces[..., self.FIELDS.index(name)]
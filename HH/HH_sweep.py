@@ -0,0 +1,113 @@
+import copy
+import numpy as np
+
+from HH_base import HodgkinHuxley
+from HH_spike_stats import ragged, train_index
+from HH_stimulus import Current
+
+PARAMETERS = ('C_m', 'g_Na', 'g_K', 'g_L', 'E_Na', 'E_K', 'E_L')
+""" Model constants a sweep may vary """
+
+
+def parameter_grid(**axes):
+    """
+    Cartesian grid of parameter values
+
+    |  :param axes: parameter name to 1-D array of values, e.g. g_Na=..., g_K=...
+    |  :return: dict of name to array, each of shape (len(axis 1), len(axis 2), ...)
+    """
+    return dict(zip(axes, np.meshgrid(*axes.values(), indexing='ij')))
+
+
+def batch_runner(params, runner=None):
+    """
+    Copy of runner whose constants are (N,) arrays, one value per neuron
+
+    HodgkinHuxley evaluates its constants elementwise against the state of
+    every neuron, so per-neuron arrays set on an instance turn one batched
+    run into N differently parameterized neurons.
+
+    |  :param params: name from PARAMETERS to a value or an array; all of
+    |                 them are broadcast together and flattened
+    |  :param runner: HodgkinHuxley to copy, None for a new one
+    |  :return: the copy, and the grid shape the neurons were flattened from
+    """
+    unknown = set(params) - set(PARAMETERS)
+    if unknown:
+        raise ValueError('cannot sweep {0}'.format(', '.join(sorted(unknown))))
+    runner = copy.copy(HodgkinHuxley() if runner is None else runner)
+    arrays = np.broadcast_arrays(*[np.asarray(v, dtype=float) for v in params.values()])
+    shape = arrays[0].shape if arrays else ()
+    for name, a in zip(params, arrays):
+        setattr(runner, name, a.ravel() if a.ndim else float(a))
+    return runner, shape
+
+
+def fi_curves(params, currents, duration=500.0, t_settle=100.0, threshold=0.0, runner=None):
+    """
+    Firing rate of every parameter point at every injected current, from
+    one batched run of len(currents) neurons per parameter point
+
+    Each neuron gets a constant current from t = 0 and only its spikes
+    after t_settle count, so the initial transient does not. The run keeps
+    spike times only, never traces.
+
+    |  :param params: name from PARAMETERS to a value or an array of values,
+    |                 e.g. from parameter_grid(); scalars apply everywhere
+    |  :param currents: injected currents, in uA/cm^2
+    |  :param duration: simulated time, in ms
+    |  :param t_settle: transient to discard, in ms
+    |  :param threshold: spike threshold, in mV
+    |  :param runner: HodgkinHuxley giving the method, dt and other constants,
+    |                 None for a fixed-step tabulated one
+    |  :return: rates in Hz, of shape grid shape + (len(currents),)
+    """
+    if runner is None:
+        runner = HodgkinHuxley()
+        runner.method = 'rush_larsen'
+        runner.tabulated = True
+        runner.dt = 0.025
+    currents = np.atleast_1d(np.asarray(currents, dtype=float))
+    runner, shape = batch_runner(params, runner)
+    P, C = int(np.prod(shape)), len(currents)
+    # neuron p*C + c is parameter point p at current c
+    for name in params:
+        value = getattr(runner, name)
+        if np.ndim(value):
+            setattr(runner, name, np.repeat(value, C))
+    runner.stimulus = Current(np.tile(currents, P))
+    runner.t = np.array([0.0, duration])
+
+    values, offsets = ragged(runner.spike_times(np.tile(runner.X0, (P*C, 1)), threshold))
+    late = values >= t_settle
+    counts = np.bincount(train_index(offsets)[late], minlength=P*C)
+    return (1000.0 * counts / (duration - t_settle)).reshape(shape + (C,))
+
+
+def response_map(params, current, **kwargs):
+    """
+    Firing rate over a parameter grid at one injected current
+
+    |  :param current: injected current, in uA/cm^2
+    |  :param kwargs: duration, t_settle, threshold and runner, as in fi_curves()
+    |  :return: rates in Hz, of the grid shape
+    """
+    return fi_curves(params, [current], **kwargs)[..., 0]
+
+
+if __name__ == '__main__':
+    import time
+
+    classic = HodgkinHuxley.CLASSIC
+    currents = np.linspace(0, 20, 11)
+    start = time.time()
+    rates = fi_curves(dict(g_Na=np.linspace(80, 160, 5), **classic), currents)
+    print('F-I curves over g_Na in {0:.1f} s'.format(time.time() - start))
+    for g, r in zip(np.linspace(80, 160, 5), rates):
+        print('g_Na {0:5.1f}: {1}'.format(g, np.round(r, 1)))
+
+    start = time.time()
+    grid = parameter_grid(g_Na=np.linspace(60, 180, 100), g_K=np.linspace(18, 54, 100))
+    rates = response_map(dict(grid, **classic), 10.0)
+    print('100 x 100 g_Na x g_K response map at 10 uA/cm^2 in {0:.1f} s, {1:.0f} to {2:.0f} Hz'.format(
+        time.time() - start, rates.min(), rates.max()))
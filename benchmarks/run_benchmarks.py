@@ -0,0 +1,176 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, os.path.join(ROOT, 'HH'))
+sys.path.insert(0, os.path.join(ROOT, 'Chaos'))
+from HH_base import HodgkinHuxley
+from HH_stimulus import Stimulus
+from logistic_map import simulate
+
+BENCHMARKS = []
+""" (name, function) of every benchmark, in run order """
+
+
+def benchmark(func):
+    """Register func as a benchmark; func(quick) returns a list of cases"""
+    BENCHMARKS.append((func.__name__, func))
+    return func
+
+
+def timed(func, repeat=5, number=1):
+    """
+    Time func() like timeit, keeping every repeat
+
+    |  :param repeat: timings to take
+    |  :param number: calls per timing
+    |  :return: best, median and all per-call times, in seconds
+    """
+    func()  # warm up caches and rate tables
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - start) / number)
+    return dict(best=min(times), median=float(np.median(times)), times=times)
+
+
+def pulse_runner(N, duration, method='odeint'):
+    """
+    HodgkinHuxley driven by a fixed pulse train, N copies when N > 1
+
+    |  :param duration: length of the time grid, in ms
+    """
+    rng = np.random.RandomState(0)
+    runner = HodgkinHuxley()
+    runner.method = method
+    intervals = rng.uniform(5.0, 15.0, (N, int(duration // 5) + 1))
+    runner.stimulus = Stimulus(intervals if N > 1 else intervals[0])
+    runner.t = np.arange(0, duration, 0.1)
+    return runner
+
+
+@benchmark
+def rhs(quick):
+    """One dALLdt evaluation, single neuron and a batch of 1000"""
+    cases = []
+    runner = HodgkinHuxley()
+    for N in (1, 1000):
+        X = np.tile(runner.X0, N).astype(float)
+        r = timed(lambda: runner.dALLdt(X, 150.0, runner), repeat=5, number=200 if quick else 2000)
+        cases.append(dict(params=dict(N=N), **r))
+    return cases
+
+
+@benchmark
+def main_horizon(quick):
+    """Main() on the built-in current steps at several horizons"""
+    cases = []
+    for horizon in ((50, 200) if quick else (50, 200, 500, 2000)):
+        runner = HodgkinHuxley()
+        runner.t = np.arange(0, horizon, 0.1)
+        r = timed(runner.Main, repeat=3)
+        cases.append(dict(params=dict(horizon_ms=horizon), **r))
+    return cases
+
+
+@benchmark
+def batched(quick):
+    """
+    A pulse-driven batch of N neurons in one integrate() call. odeint
+    restarts at every pulse edge of every neuron, so it stops at N = 100;
+    the fixed-step rush_larsen method goes up to 10^4.
+    """
+    cases = []
+    sizes = dict(odeint=(1, 10) if quick else (1, 10, 100),
+                 rush_larsen=(1, 10, 100) if quick else (1, 10, 100, 1000, 10000))
+    for method in ('odeint', 'rush_larsen'):
+        for N in sizes[method]:
+            runner = pulse_runner(N, 50.0, method)
+            X0 = np.tile(runner.X0, (N, 1)) if N > 1 else None
+            r = timed(lambda: runner.integrate(X0), repeat=1 if N >= 1000 else 3)
+            cases.append(dict(params=dict(method=method, N=N), per_neuron=r['best'] / N, **r))
+    return cases
+
+
+@benchmark
+def logistic(quick):
+    """simulate() of the logistic map at large rate counts"""
+    cases = []
+    for num_rates in ((10**3, 10**5) if quick else (10**3, 10**5, 10**6)):
+        for dtype in (np.float64, np.float32):
+            r = timed(lambda: simulate(num_gens=1000, rate_min=0.5, rate_max=4.0,
+                                       num_rates=num_rates, dtype=dtype), repeat=3)
+            cases.append(dict(params=dict(num_gens=1000, num_rates=num_rates,
+                                          dtype=np.dtype(dtype).name), **r))
+    return cases
+
+
+@benchmark
+def render(quick):
+    """Frames of one run blitted by TraceRenderer, without encoding"""
+    from HH_render import TraceRenderer
+
+    cases = []
+    runner = pulse_runner(1, 140.0)
+    V = runner.Main()
+    n_frames = 8 if quick else 50
+    with TraceRenderer() as renderer:
+        def frames():
+            renderer.set_run(runner.t, V, 'benchmark')
+            for _ in renderer.frames(n_frames):
+                pass
+        r = timed(frames, repeat=3)
+    cases.append(dict(params=dict(n_frames=n_frames), per_frame=r['best'] / (n_frames - 1), **r))
+    return cases
+
+
+def git_revision():
+    """Commit the benchmarks ran against, None outside a git checkout"""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(names=None, quick=False):
+    """
+    Run the selected benchmarks
+
+    |  :param names: benchmark names, None for all of them
+    |  :param quick: smaller sizes, for a fast smoke run
+    |  :return: JSON-ready results with the machine and commit they came from
+    """
+    results = dict(commit=git_revision(), time=time.strftime('%Y-%m-%dT%H:%M:%S'),
+                   quick=quick, python=platform.python_version(), numpy=np.__version__,
+                   machine=platform.platform(), benchmarks={})
+    for name, func in BENCHMARKS:
+        if names and name not in names:
+            continue
+        start = time.perf_counter()
+        results['benchmarks'][name] = func(quick)
+        print('{0}: {1:.2f} s'.format(name, time.perf_counter() - start))
+        for case in results['benchmarks'][name]:
+            print('    {0}  best {1:.3g} s'.format(case['params'], case['best']))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time the RHS, integration, logistic map and rendering hot paths')
+    parser.add_argument('names', nargs='*', help='benchmarks to run: ' + ', '.join(n for n, _ in BENCHMARKS))
+    parser.add_argument('--quick', action='store_true', help='smaller sizes, for a fast smoke run')
+    parser.add_argument('--output', default='benchmarks/results.json', help='JSON file to write')
+    args = parser.parse_args()
+
+    results = run(args.names, args.quick)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print('wrote ' + args.output)
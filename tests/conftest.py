@@ -0,0 +1,7 @@
+import os
+import sys
+
+# the modules import each other by name from their own directories
+here = os.path.dirname(os.path.abspath(__file__))
+for name in ('HH', 'Chaos'):
+    sys.path.insert(0, os.path.join(here, os.pardir, name))
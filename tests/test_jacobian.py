@@ -0,0 +1,33 @@
+import numpy as np
+from scipy.linalg import block_diag
+
+from HH_base import HodgkinHuxley, _banded
+
+
+def states(N, seed=0):
+    rng = np.random.RandomState(seed)
+    return np.column_stack((rng.uniform(-80, 30, N), rng.uniform(0, 1, (N, 3)))).ravel()
+
+
+def test_jacobian_matches_finite_differences():
+    model = HodgkinHuxley()
+    X = states(3)
+    J = block_diag(*model.jacobian(X, 150.0, model))
+    eps = 1e-6
+    numeric = np.column_stack([(model.dALLdt(X + eps*e, 150.0, model) - model.dALLdt(X - eps*e, 150.0, model))
+                               / (2*eps) for e in np.eye(len(X))])
+    np.testing.assert_allclose(J, numeric, rtol=1e-5, atol=1e-6)
+
+
+def test_banded_packing():
+    model = HodgkinHuxley()
+    X = states(5)
+    dense = block_diag(*model.jacobian(X, 0.0, model))
+    packed = _banded(model.jacobian(X, 0.0, model))
+    assert packed.shape == (7, len(X))
+    # LSODA's band storage with ml = mu = 3: packed[3 + i - j, j] = J[i, j]
+    for i in range(len(X)):
+        for j in range(max(i - 3, 0), min(i + 4, len(X))):
+            assert packed[3 + i - j, j] == dense[i, j]
+    # blocks never reach further than 3 off the diagonal
+    assert not np.triu(dense, 4).any() and not np.tril(dense, -4).any()
@@ -0,0 +1,26 @@
+import numpy as np
+
+from HH_spike_stats import fano, instantaneous_rate, ragged, window_counts
+
+
+def trains():
+    return ragged([np.array([2.0, 5.0, 10.0]), np.array([]), np.array([3.0])])
+
+
+def test_window_counts():
+    values, offsets = trains()
+    counts = window_counts(values, offsets, 5.0, 0.0, 15.0)
+    np.testing.assert_array_equal(counts, [[1, 1, 1], [0, 0, 0], [1, 0, 0]])
+
+
+def test_span_shorter_than_a_window():
+    values, offsets = trains()
+    assert window_counts(values, offsets, 50.0).shape == (3, 0)
+    assert window_counts(values, offsets, 5.0, 20.0, 10.0).shape == (3, 0)
+    assert np.isnan(fano(values, offsets, 50.0)).all()
+    np.testing.assert_array_equal(fano(values, offsets, [5.0, 50.0])[0], [0.0, np.nan, 0.5])
+
+
+def test_silent_population():
+    rate, t = instantaneous_rate(*ragged([[], []]))
+    assert rate.shape == (2, 0) and t.shape == (0,)
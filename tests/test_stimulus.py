@@ -0,0 +1,38 @@
+import numpy as np
+
+from HH_stimulus import Stimulus
+
+
+def reference(onsets, t, amplitude, width):
+    """Pulse current of every train at t, one train at a time"""
+    I = []
+    for x in onsets:
+        before = x[x <= t]
+        I.append(amplitude if len(before) and t - before[-1] < width else 0.0)
+    return np.array(I)
+
+
+def test_single_train():
+    stimulus = Stimulus([1.0, 2.0, 0.5], amplitude=10.0, width=1.0, scale=2.0)
+    np.testing.assert_allclose(stimulus.onsets[0], [2.0, 6.0, 7.0])
+    for t, I in ((0.0, 0.0), (2.0, 10.0), (2.99, 10.0), (3.0, 0.0), (7.5, 10.0), (8.0, 0.0), (1e6, 0.0)):
+        assert stimulus(t) == I
+
+
+def test_ragged_and_empty_trains():
+    intervals = [[1.0, 2.0, 3.0], [], [0.5], [4.0, 0.0, 1.0, 2.5], []]
+    stimulus = Stimulus(intervals, amplitude=5.0, width=0.75)
+    assert len(stimulus) == 5 and stimulus.batched
+    for t in np.arange(-1.0, 12.0, 0.05):
+        np.testing.assert_array_equal(stimulus(t), reference(stimulus.onsets, t, 5.0, 0.75))
+
+
+def test_negative_start():
+    stimulus = Stimulus([[1.0, 1.0], [3.0]], width=0.5, t0=-2.0)
+    for t in np.arange(-3.0, 3.0, 0.05):
+        np.testing.assert_array_equal(stimulus(t), reference(stimulus.onsets, t, 10.0, 0.5))
+
+
+def test_all_trains_empty():
+    stimulus = Stimulus([[], []])
+    np.testing.assert_array_equal(stimulus(0.0), [0.0, 0.0])
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from HH_base import HodgkinHuxley
+from HH_stimulus import Stimulus
+
+
+def runner():
+    model = HodgkinHuxley()
+    model.method = 'rush_larsen'
+    model.dt = 0.025
+    return model
+
+
+def whole(model, intervals, dt, scale, tail=10.0):
+    """One integrate() over the full pulse train stream() should reproduce"""
+    model.stimulus = Stimulus(intervals, scale=scale)
+    last = max(x[-1] for x in model.stimulus.onsets)
+    n = int(np.ceil((last + model.stimulus.width + tail) / dt - 1e-9))
+    model.t = dt*np.arange(n + 1)
+    X0 = np.tile(model.X0, (len(model.stimulus), 1)) if model.stimulus.batched else None
+    return model.t, model.integrate(X0)[..., 0]
+
+
+@pytest.mark.parametrize('chunk', [1, 7, 50])
+def test_stream_matches_integrate(chunk):
+    intervals = np.random.RandomState(0).uniform(0.1, 1.0, 50)
+    model = runner()
+    t, V = zip(*model.stream((intervals[i:i + chunk] for i in range(0, 50, chunk)), dt=0.1, scale=5.0))
+    t_ref, V_ref = whole(runner(), intervals, 0.1, 5.0)
+    np.testing.assert_allclose(np.concatenate(t), t_ref)
+    np.testing.assert_allclose(np.concatenate(V), V_ref, atol=1e-9)
+    assert model.stimulus is None and model.t is None
+
+
+def test_stream_batched_matches_integrate():
+    intervals = np.random.RandomState(1).uniform(0.1, 1.0, (40, 3))
+    t, V = zip(*runner().stream((intervals[i:i + 10] for i in range(0, 40, 10)), dt=0.1, scale=5.0))
+    t_ref, V_ref = whole(runner(), intervals.T, 0.1, 5.0)
+    V = np.concatenate(V, axis=1)
+    assert V.shape == (3, len(t_ref))
+    np.testing.assert_allclose(V, V_ref, atol=1e-9)
+
+
+def test_stream_raises_when_a_neuron_stalls():
+    zeros = (np.zeros(100) for _ in range(1000))
+    with pytest.raises(ValueError, match='stalled'):
+        for _ in runner().stream(zeros, scale=5.0, max_pending=1000):
+            pass